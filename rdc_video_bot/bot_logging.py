@@ -0,0 +1,87 @@
+"""
+Logging setup shared by main, sheet and script.
+
+Records are handed to a QueueHandler and written to the console and a rotating log file
+by a QueueListener thread, so hot loops never block on terminal or disk I/O. Modules log
+through logging.getLogger(__name__) and use lazy %-style arguments for per-item DEBUG events.
+
+In interactive mode the console handler stays synchronous instead, so a run's last log lines
+are printed before the menu prompts for input rather than interleaved with it.
+"""
+import atexit
+import logging
+import os
+import queue
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+_listener = None
+
+
+def setup_logging(log_dir="logs", quiet=False, verbose=False, interactive=False):
+    """
+    Configure non-blocking logging to both console and file with rotation.
+
+    Args:
+        log_dir (str): Directory for the rotating log files.
+        quiet (bool): Batch mode; only warnings and errors reach the console (the log file is unaffected).
+        verbose (bool): Also emit per-item DEBUG events (every parsed video, every match).
+        interactive (bool): Write console output synchronously from the calling thread (only the log
+                            file goes through the queue), for callers that mix logs with input().
+
+    Returns:
+        logging.Logger: The configured root logger.
+    """
+    global _listener
+
+    # Create logs directory if it doesn't exist
+    if not os.path.exists(log_dir):
+        os.makedirs(log_dir)
+
+    # Generate log filename with date
+    log_filename = os.path.join(log_dir, f"video_bot_{datetime.now().strftime('%Y-%m-%d')}.log")
+
+    # Stop a listener from a previous call (important for repeated runs)
+    stop_logging()
+
+    formatter = logging.Formatter(LOG_FORMAT)
+
+    file_handler = RotatingFileHandler(
+        log_filename, maxBytes=10*1024*1024, backupCount=5
+    )
+    file_handler.setFormatter(formatter)
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+    console_handler.setLevel(logging.WARNING if quiet else logging.DEBUG)
+
+    queued_handlers = [file_handler] if interactive else [file_handler, console_handler]
+    log_queue = queue.SimpleQueue()
+    _listener = QueueListener(log_queue, *queued_handlers, respect_handler_level=True)
+    _listener.start()
+
+    logger = logging.getLogger()
+    logger.setLevel(logging.DEBUG if verbose else logging.INFO)
+    if logger.hasHandlers():
+        logger.handlers.clear()
+    logger.addHandler(QueueHandler(log_queue))
+    if interactive:
+        logger.addHandler(console_handler)
+
+    logging.info("Logging initialized. Log file: %s", log_filename)
+    return logger
+
+
+def stop_logging():
+    """Flushes queued records and stops the background listener, if running."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(stop_logging)
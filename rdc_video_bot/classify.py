@@ -0,0 +1,251 @@
+"""
+Classifies video titles against the VIDEO_FILTER keywords.
+
+Titles are scored in batches with rapidfuzz's cdist and reduced to one bitmask per title
+(bit i set means game i matched). For large backfills the titles can be sharded across a
+ProcessPoolExecutor; the compiled keyword set is shipped to each worker once through the
+pool initializer, and workers return compact uint32 mask arrays that are merged in order.
+
+Before fuzzy scoring, an exact-match index tags titles that contain a keyword verbatim
+(partial_ratio 100) by searching a single newline-joined buffer of all titles. The fuzzy
+scorer then only checks keywords of games without an exact hit, skipping keywords too short
+to match other than verbatim, so the result is identical to fuzzy-only matching. Titles with
+an exact hit that still have keywords left to check are counted as near misses.
+"""
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+import numpy as np
+from rapidfuzz import fuzz, process
+from config import VIDEO_FILTER, CLASSIFY_WORKERS, CLASSIFY_CHUNK_SIZE, PARALLEL_CLASSIFY_MIN_TITLES
+
+logger = logging.getLogger(__name__)
+
+
+class CompiledKeywords(NamedTuple):
+    """Lower-cased keywords with the bit of the game each one belongs to, plus the exact-match index (keyword -> game bits)."""
+    games: tuple
+    keywords: list
+    keyword_bits: np.ndarray
+    exact_bits: dict
+
+
+# Indices into the path counts returned by classify_titles
+(PATH_TOTAL, PATH_EXACT_RESOLVED, PATH_NEAR_MISS, PATH_NO_EXACT_HIT,
+ PATH_FUZZY_MATCHED, PATH_FUZZY_PAIRS) = range(6)
+_PATH_COUNT_SIZE = 6
+
+
+# Per-process state set by _init_worker
+_worker_keywords = None
+_worker_threshold = None
+
+
+def compile_keywords(video_filter=VIDEO_FILTER):
+    """Flattens a game -> keywords mapping into a CompiledKeywords set."""
+    games = tuple(video_filter.keys())
+    if len(games) > 32:
+        raise ValueError(f"At most 32 games can be classified, got {len(games)}.")
+
+    keywords = []
+    keyword_bits = []
+    exact_bits = {}
+    for game_index, game_keywords in enumerate(video_filter.values()):
+        for keyword in game_keywords:
+            keywords.append(keyword.lower())
+            keyword_bits.append(1 << game_index)
+            if keyword:
+                exact_bits[keyword.lower()] = exact_bits.get(keyword.lower(), 0) | (1 << game_index)
+
+    return CompiledKeywords(games, keywords, np.array(keyword_bits, dtype=np.uint32), exact_bits)
+
+
+def _exact_match_masks(lowered_titles, compiled):
+    """Game bitmasks of verbatim keyword hits, found by searching all titles joined by newlines."""
+    title_lengths = np.fromiter((len(title) for title in lowered_titles), dtype=np.int64, count=len(lowered_titles))
+    title_starts = np.concatenate(([0], np.cumsum(title_lengths + 1)[:-1]))
+    joined_titles = "\n".join(lowered_titles)
+
+    match_positions = []
+    match_bits = []
+    # Keywords never contain a newline, so every hit lies inside a single title
+    for keyword, bits in compiled.exact_bits.items():
+        position = joined_titles.find(keyword)
+        while position != -1:
+            match_positions.append(position)
+            match_bits.append(bits)
+            position = joined_titles.find(keyword, position + 1)
+
+    exact_masks = np.zeros(len(lowered_titles), dtype=np.uint32)
+    if match_positions:
+        title_indices = np.searchsorted(title_starts, match_positions, side='right') - 1
+        np.bitwise_or.at(exact_masks, title_indices, np.array(match_bits, dtype=np.uint32))
+    return exact_masks, title_lengths
+
+
+def _exact_only_keywords(compiled, threshold):
+    """
+    Indices of keywords that can only score above threshold by occurring verbatim.
+
+    With the keyword as the shorter string, partial_ratio is 200 * lcs / (len(keyword) + len(window))
+    and lcs <= len(window) <= len(keyword). If lcs = len(keyword) - 1 cannot clear the threshold,
+    only a window equal to the keyword can, which the exact scan already detects.
+    """
+    if threshold >= 100:
+        # Nothing clears the threshold verbatim either; let the fuzzy scorer decide everything
+        return set()
+    return {
+        index for index, keyword in enumerate(compiled.keywords)
+        if keyword and 200 * (len(keyword) - 1) / (2 * len(keyword) - 1) <= threshold
+    }
+
+
+def _pending_keywords(title_length, exact_mask, compiled, exact_only):
+    """Keyword indices the fuzzy scorer still has to check for a title."""
+    return tuple(
+        index for index, bit in enumerate(compiled.keyword_bits)
+        if not exact_mask & int(bit)
+        # A title shorter than the keyword becomes the needle, so the exact-only shortcut does not apply
+        and (index not in exact_only or title_length < len(compiled.keywords[index]))
+    )
+
+
+def _fuzzy_match_masks(titles, keyword_indices, compiled, threshold):
+    keywords = [compiled.keywords[index] for index in keyword_indices]
+    keyword_bits = compiled.keyword_bits[list(keyword_indices)]
+    # float64 so the '> threshold' comparison matches scoring titles one at a time
+    scores = process.cdist(keywords, titles, scorer=fuzz.partial_ratio, dtype=np.float64, workers=1)
+    keyword_hits = np.where(scores > threshold, keyword_bits[:, None], np.uint32(0))
+    return np.bitwise_or.reduce(keyword_hits, axis=0).astype(np.uint32)
+
+
+def classify_titles(titles, compiled, threshold=80):
+    """
+    Tags titles with exact keyword hits, then fuzzy-scores only the keywords left undecided.
+
+    Titles are grouped by the set of keywords still to check, and each group is scored in a
+    single batched call.
+
+    Returns:
+        tuple: (np.ndarray of one uint32 game bitmask per title in input order,
+                np.ndarray of path counts indexed by the PATH_* constants)
+    """
+    if len(titles) == 0:
+        return np.zeros(0, dtype=np.uint32), np.zeros(_PATH_COUNT_SIZE, dtype=np.int64)
+
+    lowered_titles = [str(title).lower() for title in titles]
+    exact_masks, title_lengths = _exact_match_masks(lowered_titles, compiled)
+    if threshold >= 100:
+        # An exact hit only guarantees a match while the threshold is below a perfect score
+        exact_masks[:] = 0
+
+    exact_only = _exact_only_keywords(compiled, threshold)
+    exact_only_max_length = max((len(compiled.keywords[index]) for index in exact_only), default=0)
+
+    # The keywords left to check depend only on the exact-hit mask and, for titles shorter than
+    # an exact-only keyword, on the title length; group titles by both
+    capped_lengths = np.minimum(title_lengths, exact_only_max_length)
+    group_keys = exact_masks.astype(np.int64) * (exact_only_max_length + 1) + capped_lengths
+    unique_keys, key_groups = np.unique(group_keys, return_inverse=True)
+    fuzzy_groups = {}
+    for group, key in enumerate(unique_keys):
+        exact_mask, title_length = divmod(int(key), exact_only_max_length + 1)
+        pending = _pending_keywords(title_length, exact_mask, compiled, exact_only)
+        fuzzy_groups.setdefault(pending, []).append(np.flatnonzero(key_groups == group))
+
+    masks = exact_masks.copy()
+    path_counts = np.zeros(_PATH_COUNT_SIZE, dtype=np.int64)
+    path_counts[PATH_TOTAL] = len(lowered_titles)
+    for keyword_indices, index_arrays in fuzzy_groups.items():
+        title_indices = np.concatenate(index_arrays)
+        if not keyword_indices:
+            path_counts[PATH_EXACT_RESOLVED] += len(title_indices)
+            continue
+
+        near_misses = np.count_nonzero(exact_masks[title_indices])
+        path_counts[PATH_NEAR_MISS] += near_misses
+        path_counts[PATH_NO_EXACT_HIT] += len(title_indices) - near_misses
+
+        fuzzy_masks = _fuzzy_match_masks([lowered_titles[index] for index in title_indices], keyword_indices, compiled, threshold)
+        masks[title_indices] |= fuzzy_masks
+        path_counts[PATH_FUZZY_MATCHED] += np.count_nonzero(fuzzy_masks)
+        path_counts[PATH_FUZZY_PAIRS] += len(keyword_indices) * len(title_indices)
+
+    return masks, path_counts
+
+
+def _init_worker(compiled, threshold):
+    global _worker_keywords, _worker_threshold
+    _worker_keywords = compiled
+    _worker_threshold = threshold
+
+
+def _classify_chunk(titles):
+    return classify_titles(titles, _worker_keywords, _worker_threshold)
+
+
+def _chunked(titles, chunk_size):
+    return [titles[start:start + chunk_size] for start in range(0, len(titles), chunk_size)]
+
+
+def classify_titles_sharded(titles, compiled=None, threshold=80, workers=None, chunk_size=CLASSIFY_CHUNK_SIZE):
+    """
+    Classifies titles, sharding them across worker processes for large batches.
+
+    Args:
+        titles (list): Video titles.
+        compiled (CompiledKeywords): Keyword set; compiled from VIDEO_FILTER if omitted.
+        threshold (int): Minimum partial_ratio score (exclusive) for a keyword to match.
+        workers (int): Worker processes; defaults to CLASSIFY_WORKERS, 0 means one per CPU core.
+        chunk_size (int): Titles per task.
+
+    Returns:
+        np.ndarray: One uint32 game bitmask per title, in input order.
+    """
+    compiled = compiled or compile_keywords()
+    if workers is None:
+        workers = CLASSIFY_WORKERS
+    if not workers:
+        workers = os.cpu_count() or 1
+    chunks = _chunked(titles, chunk_size)
+
+    if workers <= 1 or len(titles) < PARALLEL_CLASSIFY_MIN_TITLES or len(chunks) <= 1:
+        # Pool start-up costs more than it saves on small batches
+        results = [classify_titles(chunk, compiled, threshold) for chunk in chunks]
+    else:
+        workers = min(workers, len(chunks))
+        logger.info("Classifying %d titles in %d chunks across %d worker processes.", len(titles), len(chunks), workers)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(compiled, threshold)) as executor:
+            results = list(executor.map(_classify_chunk, chunks))
+
+    if not results:
+        return np.zeros(0, dtype=np.uint32)
+
+    _log_path_counts(sum(path_counts for _, path_counts in results), len(compiled.keywords))
+    return np.concatenate([masks for masks, _ in results])
+
+
+def _log_path_counts(path_counts, keyword_count):
+    total = int(path_counts[PATH_TOTAL])
+    if not total:
+        return
+    fuzzy_total = int(path_counts[PATH_NEAR_MISS] + path_counts[PATH_NO_EXACT_HIT])
+    logger.info(
+        "Classification paths: %d/%d titles (%.1f%%) resolved by the exact-match scan, %d near misses and "
+        "%d without an exact hit sent to fuzzy matching (%d of them matched there); "
+        "%d of %d fuzzy comparisons run (%.1f%%).",
+        path_counts[PATH_EXACT_RESOLVED], total, 100 * path_counts[PATH_EXACT_RESOLVED] / total,
+        path_counts[PATH_NEAR_MISS], path_counts[PATH_NO_EXACT_HIT], path_counts[PATH_FUZZY_MATCHED],
+        path_counts[PATH_FUZZY_PAIRS], total * keyword_count, 100 * path_counts[PATH_FUZZY_PAIRS] / (total * keyword_count),
+    )
+
+
+def decode_game_masks(masks, games):
+    """Converts game bitmasks to comma-separated, sorted game names (None for a zero mask)."""
+    decoded = {0: None}
+    for mask in np.unique(masks):
+        mask = int(mask)
+        if mask:
+            decoded[mask] = ', '.join(sorted(game for index, game in enumerate(games) if mask & (1 << index)))
+    return [decoded[int(mask)] for mask in masks]
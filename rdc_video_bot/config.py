@@ -1,3 +1,10 @@
+import os
+
+# Local state (caches, run lock) lives next to this file, so runs started from any working
+# directory (cron, the interactive menu) share it
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(PACKAGE_DIR, ".cache")
+
 # YouTube API configuration
 YOUTUBE_API_SERVICE_NAME = "youtube"
 YOUTUBE_API_VERSION = "v3"
@@ -8,6 +15,36 @@ MAX_PAGES_TO_FETCH = 25
 DEFAULT_PUBLISHED_AFTER_DATE = "2025-02-02"
 
 SPREADSHEET_NAME = "Project RDC Video Tracker"
+DASHBOARD_SHEET_NAME = "Dashboard"
+SHEET_IO_CHUNK_ROWS = 2000  # Rows per read/write request for the tracker sheets
+
+# Video metadata enrichment configuration
+VIDEOS_LIST_BATCH_SIZE = 50  # Max IDs per videos.list call (1 quota unit per call)
+MAX_CONCURRENT_API_REQUESTS = 4
+VIEW_COUNT_TTL_HOURS = 24  # View counts older than this are re-fetched
+VIDEO_METADATA_CACHE_PATH = os.path.join(CACHE_DIR, "video_metadata.json")
+
+# Async ingestion configuration (see ingest_async.py; needs the optional 'async' extra)
+ASYNC_HTTP_MAX_CONNECTIONS = 8  # Pooled keep-alive connections shared by the YouTube and Sheets calls
+ASYNC_HTTP_KEEPALIVE_SECONDS = 30
+ASYNC_HTTP_TIMEOUT_SECONDS = 60
+
+# Interactive stats configuration
+VIDEO_SNAPSHOT_PATH = os.path.join(CACHE_DIR, "videos_snapshot.pkl")  # Local copy of the main sheet, saved after every sync
+STATS_CACHE_TTL_MINUTES = 60  # Older snapshots are re-read from the sheet before showing stats
+STATS_WEEKS_TO_SHOW = 8
+
+# Run coordination (see run_lock.py)
+RUN_STATE_DIR = os.path.join(PACKAGE_DIR, ".run")
+RUN_LOCK_STALE_SECONDS = 2 * 60 * 60  # Locks whose PID cannot be checked are treated as crashed once their heartbeat is this old
+RUN_LOCK_HEARTBEAT_SECONDS = 60  # How often a running holder touches its lock file
+RUN_LOCK_POLL_SECONDS = 5
+RUN_LOCK_WAIT_TIMEOUT_SECONDS = 60 * 60
+
+# Title classification configuration
+CLASSIFY_WORKERS = 1  # Worker processes for fuzzy classification; 1 = in-process, 0 = one per CPU core
+CLASSIFY_CHUNK_SIZE = 2000  # Titles per classification task
+PARALLEL_CLASSIFY_MIN_TITLES = 10000  # Smaller batches are always classified in-process
 
 """Video filter configurations mapping game categories to search keywords."""
 
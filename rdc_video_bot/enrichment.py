@@ -0,0 +1,226 @@
+"""
+Enriches fetched videos with metadata from the YouTube videos.list endpoint.
+
+Video IDs are grouped into chunks of VIDEOS_LIST_BATCH_SIZE (1 quota unit per call)
+and only the fields we store are requested. Immutable fields are cached locally forever,
+view counts are re-fetched once they are older than VIEW_COUNT_TTL_HOURS.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import googleapiclient.errors
+from googleapiclient.http import build_http
+from config import (
+    VIDEOS_LIST_BATCH_SIZE,
+    MAX_CONCURRENT_API_REQUESTS,
+    VIEW_COUNT_TTL_HOURS,
+    VIDEO_METADATA_CACHE_PATH,
+)
+
+logger = logging.getLogger(__name__)
+
+# Parts and field masks for a full lookup (video never seen before)
+FULL_LOOKUP_PARTS = "contentDetails,statistics,liveStreamingDetails"
+FULL_LOOKUP_FIELDS = (
+    "items(id,contentDetails/duration,statistics/viewCount,"
+    "liveStreamingDetails(scheduledStartTime,actualStartTime,actualEndTime))"
+)
+
+# Parts and field masks for a view count refresh (immutable fields already cached)
+VIEW_COUNT_LOOKUP_PARTS = "statistics"
+VIEW_COUNT_LOOKUP_FIELDS = "items(id,statistics/viewCount)"
+
+# format_iso_duration output for "P0D", the duration of a stream or premiere that has not happened yet
+ZERO_DURATION = "0:00:00"
+
+# Columns added to the video DataFrame by enrich_videos. 'is_live_broadcast' is True for videos
+# that went through YouTube's live pipeline: livestreams and premieres alike, since the API
+# reports liveStreamingDetails for both and does not tell them apart.
+METADATA_COLUMNS = ["duration", "view_count", "is_live_broadcast"]
+
+_ISO_DURATION_PATTERN = re.compile(
+    r"P(?:(?P<days>\d+)D)?(?:T(?:(?P<hours>\d+)H)?(?:(?P<minutes>\d+)M)?(?:(?P<seconds>\d+)S)?)?"
+)
+
+# Caps the number of videos.list calls in flight at once
+_quota_limiter = threading.BoundedSemaphore(MAX_CONCURRENT_API_REQUESTS)
+# googleapiclient's httplib2 transport is not thread safe, so each worker gets its own
+_thread_local = threading.local()
+_cache_lock = threading.Lock()
+
+
+def extract_video_id(video_url):
+    """Returns the bare YouTube video ID from a watch URL (or the value itself if it is already an ID)."""
+    if not isinstance(video_url, str) or not video_url:
+        return None
+    return video_url.rsplit("v=", 1)[-1]
+
+
+def format_iso_duration(iso_duration):
+    """Converts an ISO 8601 duration (e.g. 'PT1H2M3S') to 'H:MM:SS'."""
+    match = _ISO_DURATION_PATTERN.fullmatch(iso_duration or "")
+    if not match:
+        return None
+    parts = {name: int(value or 0) for name, value in match.groupdict().items()}
+    hours = parts["days"] * 24 + parts["hours"]
+    return f"{hours}:{parts['minutes']:02d}:{parts['seconds']:02d}"
+
+
+def load_metadata_cache(path=VIDEO_METADATA_CACHE_PATH):
+    """Loads the local video metadata cache, returning an empty cache if missing or unreadable."""
+    try:
+        with open(path, "r", encoding="utf-8") as cache_file:
+            return json.load(cache_file)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning("Enrich: Could not read metadata cache '%s': %s. Starting with an empty cache.", path, e)
+        return {}
+
+
+def save_metadata_cache(cache, path=VIDEO_METADATA_CACHE_PATH):
+    """Atomically writes the video metadata cache to disk."""
+    cache_dir = os.path.dirname(path)
+    if cache_dir and not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+    tmp_path = f"{path}.tmp"
+    with _cache_lock:
+        with open(tmp_path, "w", encoding="utf-8") as cache_file:
+            json.dump(cache, cache_file)
+        os.replace(tmp_path, path)
+
+
+def plan_metadata_lookups(video_ids, cache, now=None):
+    """
+    Splits video IDs into those needing a full lookup and those only needing a view count refresh.
+
+    Returns:
+        tuple: (full_lookup_ids, view_count_refresh_ids)
+    """
+    now = time.time() if now is None else now
+    ttl_seconds = VIEW_COUNT_TTL_HOURS * 3600
+    full_lookup_ids = []
+    view_count_refresh_ids = []
+
+    for video_id in video_ids:
+        cached = cache.get(video_id)
+        # Upcoming streams/premieres report a zero duration; entries cached that way before their
+        # liveStreamingDetails were requested in full, or before 'is_live_broadcast' was stored,
+        # are looked up again too
+        if (not cached or not cached.get("immutable_complete") or cached.get("duration") == ZERO_DURATION
+                or "is_live_broadcast" not in cached):
+            full_lookup_ids.append(video_id)
+        elif now - cached.get("view_count_fetched_at", 0) >= ttl_seconds:
+            view_count_refresh_ids.append(video_id)
+
+    return full_lookup_ids, view_count_refresh_ids
+
+
+def apply_metadata_items(cache, items, now=None):
+    """Merges videos.list response items into the cache."""
+    now = time.time() if now is None else now
+    for item in items:
+        entry = cache.setdefault(item["id"], {})
+
+        if "contentDetails" in item:
+            live_details = item.get("liveStreamingDetails")
+            entry["duration"] = format_iso_duration(item["contentDetails"].get("duration"))
+            entry["is_live_broadcast"] = live_details is not None
+            # A stream that is still live, or an upcoming stream/premiere (only scheduledStartTime set),
+            # has no final duration yet; keep looking it up until actualEndTime appears
+            entry["immutable_complete"] = live_details is None or "actualEndTime" in live_details
+
+        view_count = item.get("statistics", {}).get("viewCount")
+        if view_count is not None:
+            entry["view_count"] = int(view_count)
+            entry["view_count_fetched_at"] = now
+
+
+def plan_lookup_batches(video_ids, cache, now=None):
+    """
+    Groups the lookups still needed for video_ids into videos.list calls of up to 50 IDs.
+
+    Returns:
+        list: (video ID chunk, parts, fields) tuples, full lookups first.
+    """
+    full_lookup_ids, view_count_refresh_ids = plan_metadata_lookups(video_ids.dropna().unique(), cache, now)
+    lookups = [
+        (chunk, FULL_LOOKUP_PARTS, FULL_LOOKUP_FIELDS) for chunk in _chunked(full_lookup_ids)
+    ] + [
+        (chunk, VIEW_COUNT_LOOKUP_PARTS, VIEW_COUNT_LOOKUP_FIELDS) for chunk in _chunked(view_count_refresh_ids)
+    ]
+    if lookups:
+        logger.info("Enrich: %d full lookups, %d view count refreshes in %d videos.list calls (%d quota units).",
+                    len(full_lookup_ids), len(view_count_refresh_ids), len(lookups), len(lookups))
+    return lookups
+
+
+def assign_metadata_columns(videos_df, video_ids, cache):
+    """Fills METADATA_COLUMNS of videos_df (in place) from the cache; returns videos_df."""
+    for column in METADATA_COLUMNS:
+        videos_df[column] = video_ids.map(lambda video_id: cache.get(video_id, {}).get(column))
+    return videos_df
+
+
+def _chunked(values, size=VIDEOS_LIST_BATCH_SIZE):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _thread_http():
+    if not hasattr(_thread_local, "http"):
+        _thread_local.http = build_http()
+    return _thread_local.http
+
+
+def _execute_videos_list(youtube, video_ids, parts, fields):
+    """Runs a single videos.list call for up to 50 IDs under the quota limiter."""
+    request = youtube.videos().list(
+        part=parts,
+        id=",".join(video_ids),
+        fields=fields,
+        maxResults=VIDEOS_LIST_BATCH_SIZE,
+    )
+    with _quota_limiter:
+        try:
+            response = request.execute(http=_thread_http())
+        except googleapiclient.errors.HttpError as e:
+            logger.warning("Enrich: videos.list failed for %s videos: %s", len(video_ids), e)
+            return []
+    return response.get("items", [])
+
+
+def enrich_videos(youtube, videos_df):
+    """
+    Adds duration, view count and live broadcast (stream or premiere) columns to a video DataFrame.
+
+    Args:
+        youtube: An initialized YouTube API client.
+        videos_df (pd.DataFrame): Videos with a 'video_id' column containing watch URLs.
+
+    Returns:
+        pd.DataFrame: The same DataFrame with METADATA_COLUMNS populated where available.
+    """
+    if videos_df is None or videos_df.empty or 'video_id' not in videos_df.columns:
+        return videos_df
+
+    video_ids = videos_df['video_id'].map(extract_video_id)
+    cache = load_metadata_cache()
+    now = time.time()
+
+    lookups = plan_lookup_batches(video_ids, cache, now)
+
+    if lookups:
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_API_REQUESTS) as executor:
+            results = executor.map(lambda lookup: _execute_videos_list(youtube, *lookup), lookups)
+            for items in results:
+                apply_metadata_items(cache, items, now)
+        save_metadata_cache(cache)
+    else:
+        logger.info("Enrich: All %s videos served from metadata cache.", len(video_ids))
+
+    return assign_metadata_columns(videos_df, video_ids, cache)
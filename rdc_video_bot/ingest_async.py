@@ -0,0 +1,439 @@
+"""
+Asyncio ingestion path: playlist paging, metadata enrichment and the tracker sheet sync over
+one pooled HTTP client.
+
+The blocking path builds a googleapiclient (httplib2) client and a gspread (requests) session
+and makes one call at a time. Here every YouTube Data and Sheets API call goes through a single
+httpx.AsyncClient with keep-alive connections and gzip responses, so independent calls overlap:
+the main sheet is read while the playlist is paged, sheet blocks are read and written
+concurrently, and the dashboard is written while the main sheet write is being acknowledged.
+Paging state, block planning, merging and the dashboard values are shared with the blocking
+path (main.PlaylistPager and the public helpers in sheet); only the transport differs here.
+
+httpx is an optional dependency (poetry install -E async).
+"""
+import asyncio
+import logging
+import os
+import time
+from urllib.parse import quote
+import pandas as pd
+import gspread
+from gspread.utils import absolute_range_name, rowcol_to_a1
+from config import (
+    YOUTUBE_API_VERSION, YOUTUBE_PLAYLIST_ID, SPREADSHEET_NAME, DASHBOARD_SHEET_NAME,
+    SHEET_IO_CHUNK_ROWS, MAX_CONCURRENT_API_REQUESTS,
+    ASYNC_HTTP_MAX_CONNECTIONS, ASYNC_HTTP_KEEPALIVE_SECONDS, ASYNC_HTTP_TIMEOUT_SECONDS,
+)
+from main import PlaylistPager, fuzzy_filter_videos
+from enrichment import (
+    extract_video_id, load_metadata_cache, save_metadata_cache, plan_lookup_batches,
+    apply_metadata_items, assign_metadata_columns, VIDEOS_LIST_BATCH_SIZE,
+)
+from sheet import (
+    save_video_snapshot, SheetRowsBuffer, read_block_ranges, write_grid_size, write_blocks,
+    dashboard_values, merge_fetched_videos,
+)
+
+try:
+    import httpx
+except ImportError:  # Optional 'async' extra
+    httpx = None
+
+logger = logging.getLogger(__name__)
+
+ASYNC_INGESTION_AVAILABLE = httpx is not None
+
+YOUTUBE_API_URL = f"https://www.googleapis.com/youtube/{YOUTUBE_API_VERSION}"
+SHEETS_API_URL = "https://sheets.googleapis.com/v4/spreadsheets"
+DRIVE_FILES_URL = "https://www.googleapis.com/drive/v3/files"
+
+# Google APIs only gzip responses for clients that also say so in their User-Agent
+REQUEST_HEADERS = {"Accept-Encoding": "gzip", "User-Agent": "rdc-video-bot (gzip)"}
+
+
+class AsyncGoogleClient:
+    """
+    A pooled httpx.AsyncClient for the YouTube Data (API key) and Sheets/Drive (service account) APIs.
+
+    Use as an async context manager. At most MAX_CONCURRENT_API_REQUESTS calls are in flight at once.
+    """
+
+    def __init__(self, api_key, credentials):
+        if httpx is None:
+            raise ImportError("Async ingestion needs httpx; install it with 'poetry install -E async'.")
+        self.api_key = api_key
+        self.credentials = credentials
+        self._limiter = asyncio.Semaphore(MAX_CONCURRENT_API_REQUESTS)
+        self._refresh_lock = asyncio.Lock()
+        self._http = httpx.AsyncClient(
+            headers=REQUEST_HEADERS,
+            timeout=ASYNC_HTTP_TIMEOUT_SECONDS,
+            limits=httpx.Limits(
+                max_connections=ASYNC_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=ASYNC_HTTP_MAX_CONNECTIONS,
+                keepalive_expiry=ASYNC_HTTP_KEEPALIVE_SECONDS,
+            ),
+        )
+
+    @classmethod
+    def from_environment(cls):
+        """Uses API_KEY from the environment and the service account file gspread.service_account() reads."""
+        from google.oauth2.service_account import Credentials
+
+        credentials = Credentials.from_service_account_file(
+            gspread.auth.DEFAULT_SERVICE_ACCOUNT_FILENAME, scopes=gspread.auth.DEFAULT_SCOPES
+        )
+        return cls(os.getenv("API_KEY"), credentials)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self._http.aclose()
+
+    async def _auth_headers(self):
+        async with self._refresh_lock:
+            if not self.credentials.valid:
+                from google.auth.transport.requests import Request
+
+                # Token refresh is a blocking call; keep it off the event loop
+                await asyncio.to_thread(self.credentials.refresh, Request())
+        return {"Authorization": f"Bearer {self.credentials.token}"}
+
+    async def request(self, method, url, params=None, json=None, service_account=True):
+        """Sends one API call and returns its decoded JSON body (raises httpx.HTTPStatusError on failure)."""
+        headers = await self._auth_headers() if service_account else None
+        if not service_account:
+            params = dict(params or {}, key=self.api_key)
+        async with self._limiter:
+            response = await self._http.request(method, url, params=params, json=json, headers=headers)
+        response.raise_for_status()
+        return response.json() if response.content else {}
+
+    # YouTube Data API
+
+    async def playlist_items_page(self, page_token=None):
+        return await self.request("GET", f"{YOUTUBE_API_URL}/playlistItems", params={
+            "part": "snippet,contentDetails",
+            "maxResults": 50,  # 50 is max limit set by YT API
+            "playlistId": YOUTUBE_PLAYLIST_ID,
+            **({"pageToken": page_token} if page_token else {}),
+        }, service_account=False)
+
+    async def videos_list(self, video_ids, parts, fields):
+        try:
+            response = await self.request("GET", f"{YOUTUBE_API_URL}/videos", params={
+                "part": parts,
+                "id": ",".join(video_ids),
+                "fields": fields,
+                "maxResults": VIDEOS_LIST_BATCH_SIZE,
+            }, service_account=False)
+        except httpx.HTTPError as e:
+            logger.warning("Enrich: videos.list failed for %s videos: %s", len(video_ids), e)
+            return []
+        return response.get("items", [])
+
+    # Sheets API
+
+    async def open_spreadsheet(self, name=SPREADSHEET_NAME):
+        """Looks up a spreadsheet by name (like gspread.Client.open) and returns it as an AsyncSpreadsheet."""
+        escaped_name = name.replace("\\", "\\\\").replace("'", "\\'")
+        files = await self.request("GET", DRIVE_FILES_URL, params={
+            "q": f"name = '{escaped_name}' and mimeType = 'application/vnd.google-apps.spreadsheet'",
+            "fields": "files(id)",
+            "supportsAllDrives": "true",
+            "includeItemsFromAllDrives": "true",
+        })
+        if not files.get("files"):
+            raise gspread.exceptions.SpreadsheetNotFound(name)
+        spreadsheet_id = files["files"][0]["id"]
+        return AsyncSpreadsheet(self, spreadsheet_id, await self.sheet_properties(spreadsheet_id))
+
+    async def sheet_properties(self, spreadsheet_id):
+        metadata = await self.request("GET", f"{SHEETS_API_URL}/{spreadsheet_id}", params={
+            "fields": "sheets.properties(sheetId,title,index,gridProperties(rowCount,columnCount))",
+        })
+        return sorted((sheet["properties"] for sheet in metadata.get("sheets", [])), key=lambda props: props.get("index", 0))
+
+
+class AsyncSpreadsheet:
+    """The tracker spreadsheet: values and grid calls for its worksheets, by sheet properties dict."""
+
+    def __init__(self, client, spreadsheet_id, sheets):
+        self.client = client
+        self.spreadsheet_id = spreadsheet_id
+        self.sheets = sheets
+
+    @property
+    def main_sheet(self):
+        """The first worksheet, as gspread's Spreadsheet.sheet1."""
+        return self.sheets[0]
+
+    def find_sheet(self, title):
+        return next((sheet for sheet in self.sheets if sheet["title"] == title), None)
+
+    def _values_url(self, sheet, range_name):
+        # Sheet titles may contain '#', '?' or '/', so the range is a single encoded path segment (as gspread does)
+        return f"{SHEETS_API_URL}/{self.spreadsheet_id}/values/{quote(absolute_range_name(sheet['title'], range_name), safe='')}"
+
+    async def get_values(self, sheet, range_name):
+        response = await self.client.request("GET", self._values_url(sheet, range_name))
+        return response.get("values", [])
+
+    async def update_values(self, sheet, range_name, values):
+        await self.client.request(
+            "PUT", self._values_url(sheet, range_name),
+            params={"valueInputOption": "USER_ENTERED"}, json={"values": values},
+        )
+
+    async def batch_update(self, requests):
+        return await self.client.request(
+            "POST", f"{SHEETS_API_URL}/{self.spreadsheet_id}:batchUpdate", json={"requests": requests}
+        )
+
+    async def resize(self, sheet, rows, cols):
+        await self.batch_update([{"updateSheetProperties": {
+            "properties": {"sheetId": sheet["sheetId"], "gridProperties": {"rowCount": rows, "columnCount": cols}},
+            "fields": "gridProperties(rowCount,columnCount)",
+        }}])
+        sheet["gridProperties"] = dict(sheet.get("gridProperties", {}), rowCount=rows, columnCount=cols)
+
+    async def add_sheet(self, title, rows, cols):
+        response = await self.batch_update([{"addSheet": {"properties": {
+            "title": title, "gridProperties": {"rowCount": rows, "columnCount": cols},
+        }}}])
+        sheet = response["replies"][0]["addSheet"]["properties"]
+        self.sheets.append(sheet)
+        return sheet
+
+
+def _grid_size(sheet):
+    grid = sheet.get("gridProperties", {})
+    return grid.get("rowCount", 0), grid.get("columnCount", 0)
+
+
+async def _for_each_bounded(items, action, limit=MAX_CONCURRENT_API_REQUESTS):
+    """
+    Awaits action(item) for every item, at most `limit` at a time, and returns the (item, error) pairs that failed.
+
+    Items are pulled from the iterable only as a worker frees up, so a generator that builds each
+    item on demand never has more than `limit` of them alive. Every item is attempted and settles
+    before this returns.
+    """
+    iterator = iter(items)
+    failures = []
+
+    async def worker():
+        for item in iterator:
+            try:
+                await action(item)
+            except Exception as e:
+                failures.append((item, e))
+
+    await asyncio.gather(*(worker() for _ in range(limit)))
+    return failures
+
+
+async def fetch_playlist_videos(client, published_after_str=None):
+    """Async counterpart of main.fetch_playlist_videos; returns the PlaylistPager (rows in video_data)."""
+    pager = PlaylistPager(published_after_str)
+    while not pager.done:
+        logger.debug("Fetching page %d with token: %s", pager.pages_fetched + 1, pager.page_token)
+        try:
+            playlist_response = await client.playlist_items_page(pager.page_token)
+        except httpx.HTTPError as e:
+            logger.error("An API error occurred: %s", e)
+            pager.stop(failed=True)
+        else:
+            pager.add_page(playlist_response)
+    return pager
+
+
+async def enrich_videos_async(client, videos_df):
+    """Async counterpart of enrichment.enrich_videos, with the videos.list calls issued concurrently."""
+    if videos_df is None or videos_df.empty or 'video_id' not in videos_df.columns:
+        return videos_df
+
+    video_ids = videos_df['video_id'].map(extract_video_id)
+    cache = load_metadata_cache()
+    now = time.time()
+
+    lookups = plan_lookup_batches(video_ids, cache, now)
+    if lookups:
+        results = await asyncio.gather(*(client.videos_list(*lookup) for lookup in lookups))
+        for items in results:
+            apply_metadata_items(cache, items, now)
+        save_metadata_cache(cache)
+    else:
+        logger.info("Enrich: All %s videos served from metadata cache.", len(video_ids))
+
+    return assign_metadata_columns(videos_df, video_ids, cache)
+
+
+async def read_video_sheet(spreadsheet, chunk_rows=SHEET_IO_CHUNK_ROWS):
+    """
+    Async counterpart of sheet._get_current_sheet_data; the row blocks are requested concurrently.
+
+    Each block is copied into a SheetRowsBuffer as it arrives, and at most MAX_CONCURRENT_API_REQUESTS
+    blocks are requested at once. If any block fails, the first error is raised once all reads have finished.
+    """
+    sheet = spreadsheet.main_sheet
+    logger.info("--- Connecting to Sheet: '%s' in Spreadsheet: '%s' ---", sheet["title"], SPREADSHEET_NAME)
+    header_rows = await spreadsheet.get_values(sheet, "1:1")
+    header = header_rows[0] if header_rows else []
+    row_count, _ = _grid_size(sheet)
+    buffer = SheetRowsBuffer(header, row_count)
+    if header:
+        async def read_block(block):
+            first_row, block_range = block
+            buffer.add_block(first_row, await spreadsheet.get_values(sheet, block_range))
+
+        failed = await _for_each_bounded(read_block_ranges(len(header), row_count, chunk_rows), read_block)
+        if failed:
+            raise failed[0][1]
+    return buffer.to_dataframe()
+
+
+async def write_video_sheet(spreadsheet, df, chunk_rows=SHEET_IO_CHUNK_ROWS):
+    """
+    Async counterpart of sheet._write_df_in_chunks; the row blocks are written concurrently.
+
+    Blocks are built from sheet.write_blocks as writers free up, so at most
+    MAX_CONCURRENT_API_REQUESTS blocks of cell values exist at once. If any block fails, the
+    first error is raised once all writes have finished.
+    """
+    sheet = spreadsheet.main_sheet
+    total_rows, total_cols = write_grid_size(df)
+
+    # Grow the grid first so every block lands inside it
+    row_count, col_count = _grid_size(sheet)
+    if row_count < total_rows or col_count < total_cols:
+        await spreadsheet.resize(sheet, max(row_count, total_rows), max(col_count, total_cols))
+
+    # Every block settles before any error is reported, so no write is still in flight when the caller sees it
+    failed = await _for_each_bounded(
+        write_blocks(df, chunk_rows), lambda block: spreadsheet.update_values(sheet, *block)
+    )
+    if failed:
+        for (block_range, _), error in failed:
+            logger.error("Write: block %s failed: %s", block_range, error)
+        # The grid is left as it is; shrinking it now could cut off rows that were not rewritten
+        raise failed[0][1]
+
+    await spreadsheet.resize(sheet, total_rows, total_cols)
+
+
+async def write_dashboard_sheet(spreadsheet, videos_df):
+    """Async counterpart of sheet.update_dashboard_sheet (errors are logged, not raised)."""
+    try:
+        logger.info("Updating dashboard sheet...")
+        values = dashboard_values(videos_df)
+        total_rows, total_cols = len(values), len(values[0])
+
+        dashboard_sheet = spreadsheet.find_sheet(DASHBOARD_SHEET_NAME)
+        if dashboard_sheet is None:
+            logger.info("Dashboard sheet not found, creating one.")
+            dashboard_sheet = await spreadsheet.add_sheet(DASHBOARD_SHEET_NAME, total_rows, total_cols)
+        else:
+            # Sizing the grid to the data and writing every cell replaces the old contents without a clear call
+            await spreadsheet.resize(dashboard_sheet, total_rows, total_cols)
+
+        await spreadsheet.update_values(dashboard_sheet, f"A1:{rowcol_to_a1(total_rows, total_cols)}", values)
+        logger.info("Dashboard sheet updated successfully.")
+    except httpx.HTTPStatusError as e:
+        logger.error("Error updating dashboard sheet (APIError): %s", e)
+        if e.response.status_code == 429:
+            logger.warning("This might be due to Google Sheets API rate limits. Consider adding delays if updates are frequent.")
+    except Exception as e:
+        logger.error("An unexpected error occurred while updating dashboard sheet: %s", e)
+
+
+async def sync_video_sheet(spreadsheet, current_df, fetched_video_frame):
+    """
+    Async counterpart of sheet.update_video_sheet, given the already-read current sheet data.
+
+    The main sheet and the dashboard are written concurrently.
+
+    Returns:
+        int: Number of new videos added to the sheet.
+    """
+    final_updated_df, new_videos_count = merge_fetched_videos(current_df, fetched_video_frame)
+
+    if final_updated_df.empty and new_videos_count == 0:
+        logger.info("Write: Updated DataFrame is empty and no new videos. Sheet will not be cleared or updated.")
+        await write_dashboard_sheet(spreadsheet, final_updated_df)
+        return 0
+
+    logger.info("Updating sheet with %s total videos (%s new) and the dashboard.", len(final_updated_df), new_videos_count)
+    main_sheet_result, _ = await asyncio.gather(
+        write_video_sheet(spreadsheet, final_updated_df),
+        write_dashboard_sheet(spreadsheet, final_updated_df),
+        return_exceptions=True,
+    )
+    if isinstance(main_sheet_result, BaseException):
+        logger.error("Main sheet update failed; the Dashboard sheet was written from the merged data "
+                     "and may be ahead of the main sheet until the next successful sync.")
+        raise main_sheet_result
+    logger.info("Main sheet updated successfully.")
+
+    # The sheet now matches final_updated_df, so keep a local copy for the stats display
+    save_video_snapshot(final_updated_df)
+    return new_videos_count
+
+
+async def _open_and_read_video_sheet(client):
+    spreadsheet = await client.open_spreadsheet(SPREADSHEET_NAME)
+    return spreadsheet, await read_video_sheet(spreadsheet)
+
+
+async def run_ingestion(published_after_date_str, workers=None, client=None):
+    """
+    Fetches playlist videos published after a date, classifies and enriches them, and syncs the
+    tracker sheet and dashboard, overlapping independent API calls.
+
+    Args:
+        published_after_date_str (str): Fetch videos published after this date (YYYY-MM-DD).
+        workers (int): Worker processes for title classification (see classify.classify_titles_sharded).
+        client (AsyncGoogleClient): Client to use; one is created from the environment (and closed) if omitted.
+
+    Returns:
+        dict: Counts of 'fetched', 'matched' and 'new' videos.
+    """
+    if client is None:
+        async with AsyncGoogleClient.from_environment() as owned_client:
+            return await run_ingestion(published_after_date_str, workers, owned_client)
+
+    summary = {"fetched": 0, "matched": 0, "new": 0}
+    logger.info("Starting async ingestion for videos published after: %s", published_after_date_str)
+
+    # The current sheet does not depend on the playlist, so read it while paging YouTube
+    sheet_task = asyncio.create_task(_open_and_read_video_sheet(client))
+    try:
+        pager = await fetch_playlist_videos(client, published_after_date_str)
+        if pager.failed and not pager.video_data:
+            raise RuntimeError("Could not fetch any playlist videos.")
+        video_data = pager.video_data
+        summary["fetched"] = len(video_data)
+        if not video_data:
+            logger.info("No videos fetched. Exiting async ingestion.")
+            return summary
+
+        video_data.sort(key=lambda x: x['date'], reverse=True)
+        # Classification is CPU-bound; run it in a thread so the sheet read keeps progressing
+        filtered_df = await asyncio.to_thread(fuzzy_filter_videos, pd.DataFrame(video_data), workers=workers)
+        summary["matched"] = len(filtered_df)
+        if filtered_df.empty:
+            logger.info("Filtered DataFrame is empty. No videos to update in the sheet.")
+            return summary
+
+        filtered_df = await enrich_videos_async(client, filtered_df)
+        spreadsheet, current_df = await sheet_task
+    finally:
+        # No-op once the read has been awaited; otherwise stop it and retrieve any error it raised
+        sheet_task.cancel()
+        await asyncio.gather(sheet_task, return_exceptions=True)
+
+    summary["new"] = await sync_video_sheet(spreadsheet, current_df, filtered_df)
+    logger.info("Async ingestion completed successfully.")
+    return summary
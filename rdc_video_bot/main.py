@@ -1,51 +1,45 @@
 import os
+import logging
 import googleapiclient.discovery
 import googleapiclient.errors
 import pandas as pd
 from dotenv import load_dotenv
-from sheet import update_video_sheet, fetch_dashboard_stats
+from sheet import update_video_sheet
+from stats import get_video_data, compute_dashboard_stats, SOURCE_CACHE, SOURCE_STALE_CACHE
+from enrichment import enrich_videos
 from datetime import datetime
-from rapidfuzz import fuzz, process
+from classify import compile_keywords, classify_titles_sharded, decode_game_masks
 from colorama import Fore, Style, init as colorama_init # Import colorama
-from config import VIDEO_FILTER, YOUTUBE_API_SERVICE_NAME, YOUTUBE_API_VERSION, YOUTUBE_PLAYLIST_ID, MAX_PAGES_TO_FETCH, DEFAULT_PUBLISHED_AFTER_DATE
+from config import YOUTUBE_API_SERVICE_NAME, YOUTUBE_API_VERSION, YOUTUBE_PLAYLIST_ID, MAX_PAGES_TO_FETCH, DEFAULT_PUBLISHED_AFTER_DATE
+from bot_logging import setup_logging
+from run_lock import coordinated_run, ON_BUSY_WAIT, STATUS_REUSED, STATUS_TIMEOUT, STATUS_FAILED
 
 
 scopes = ["https://www.googleapis.com/auth/youtube.readonly"]
 
 load_dotenv()
 
-def fetchVideosFromPlaylist(youtube, pageToken=None, proccessed_videos=None, published_after_str=None):
-    if proccessed_videos is None:
-        proccessed_videos = set()
-
-    target_date_obj = None
-    if published_after_str:
-        try:
-            target_date_obj = datetime.strptime(published_after_str, "%Y-%m-%d").date()
-        except ValueError:
-            print(f"Warning: Invalid date format for published_after_str: '{published_after_str}'. Expected YYYY-MM-DD. Date filter will not be applied.")
-            # Keep target_date_obj as None if format is invalid
-
-    if not youtube:
-        print("Youtube Client not initialized!")
-        return {'items': [], 'nextPageToken': None, 'processed_videos_set': proccessed_videos}
+logger = logging.getLogger(__name__)
 
+def parse_published_after_date(published_after_str):
+    """Parses a YYYY-MM-DD filter date, returning None (no date filter) if it is missing or invalid."""
+    if not published_after_str:
+        return None
     try:
-        playlist_request = youtube.playlistItems().list(
-            part="snippet,contentDetails",
-            maxResults=50,  # 50 is max limit set by YT API
-            playlistId=YOUTUBE_PLAYLIST_ID,  # Using imported constant
-            pageToken=pageToken
-        )
-        playlist_response = playlist_request.execute()
-    except googleapiclient.errors.HttpError as e:
-        print(f"An API error occurred: {e}")
-        return {'items': [], 'nextPageToken': None, 'processed_videos_set': proccessed_videos}
-
-    # print(playlist_response) # Optional: for debugging API response
-
+        return datetime.strptime(published_after_str, "%Y-%m-%d").date()
+    except ValueError:
+        logger.warning("Invalid date format for published_after_str: '%s'. Expected YYYY-MM-DD. Date filter will not be applied.", published_after_str)
+        return None
+
+def filter_playlist_page(playlist_response, proccessed_videos, target_date_obj=None):
+    """
+    Applies the date filter and de-duplication to one playlistItems.list response page.
+
+    Returns:
+        dict: 'items' kept from the page, 'nextPageToken' (None once the date filter stops pagination)
+              and the updated 'processed_videos_set'.
+    """
     fetched_items_on_page = playlist_response.get('items', [])
-    # print(f"Fetched {len(fetched_items_on_page)} videos from API for pageToken: {pageToken}") # Optional debug
 
     filtered_videos_for_return = []
     stop_fetching_more_pages = False
@@ -58,7 +52,8 @@ def fetchVideosFromPlaylist(youtube, pageToken=None, proccessed_videos=None, pub
         if target_date_obj and video_published_date < target_date_obj:
             # Assuming playlist items are generally ordered newest first.
             # If this item is too old, subsequent items on this page and on future pages are also likely too old.
-            print(f"Video '{item['snippet']['title']}' (published {video_published_date}) is older than target date {target_date_obj}. Stopping further pagination.")
+            logger.info("Video '%s' (published %s) is older than target date %s. Stopping further pagination.",
+                        item['snippet']['title'], video_published_date, target_date_obj)
             stop_fetching_more_pages = True
             break  # Stop processing items on this page
 
@@ -72,8 +67,6 @@ def fetchVideosFromPlaylist(youtube, pageToken=None, proccessed_videos=None, pub
     # If date filter triggered stop, ensure no next page token is returned
     if stop_fetching_more_pages:
         current_next_page_token = None
-    
-    # print(f"Returning {len(filtered_videos_for_return)} videos after filtering. Next page token: {current_next_page_token}") # Optional debug
 
     return {
         'items': filtered_videos_for_return,
@@ -81,12 +74,78 @@ def fetchVideosFromPlaylist(youtube, pageToken=None, proccessed_videos=None, pub
         'processed_videos_set': proccessed_videos
     }
 
+class PlaylistPager:
+    """
+    Paging state for a playlist fetch: date filter, de-duplication, parsing and the page limit.
+
+    The blocking and async fetch loops only request pages; both hand each response to add_page
+    and stop once done is set.
+    """
+
+    def __init__(self, published_after_str=None, max_pages=MAX_PAGES_TO_FETCH):
+        self.target_date_obj = parse_published_after_date(published_after_str)
+        self.max_pages = max_pages
+        self.video_data = []
+        self.processed_videos_set = set()
+        self.page_token = None
+        self.pages_fetched = 0
+        self.done = max_pages <= 0
+        self.failed = False
+
+    def add_page(self, playlist_response):
+        """Filters and parses one playlistItems.list response, then advances (or finishes) paging."""
+        fetch_result = filter_playlist_page(playlist_response, self.processed_videos_set, self.target_date_obj)
+        parsed_count = parse_videos(fetch_result, self.video_data)
+        self.page_token = fetch_result['nextPageToken']
+        self.pages_fetched += 1
+        logger.info("Page %d: parsed %d new videos (%d total).", self.pages_fetched, parsed_count, len(self.video_data))
+
+        if not self.page_token:
+            logger.info("No more pages to fetch (end of playlist or date filter met).")
+            self.done = True
+        elif self.pages_fetched >= self.max_pages:
+            logger.info("Reached max page fetch limit of %d.", self.max_pages)
+            self.done = True
+
+    def stop(self, failed=False):
+        """Ends paging early; failed marks a page request that errored (videos parsed so far are kept)."""
+        self.done = True
+        self.failed = failed
+
+def fetch_playlist_page(youtube, page_token=None):
+    """Requests one playlistItems.list page; returns the raw response, or None on an API error."""
+    try:
+        playlist_request = youtube.playlistItems().list(
+            part="snippet,contentDetails",
+            maxResults=50,  # 50 is max limit set by YT API
+            playlistId=YOUTUBE_PLAYLIST_ID,  # Using imported constant
+            pageToken=page_token
+        )
+        return playlist_request.execute()
+    except googleapiclient.errors.HttpError as e:
+        logger.error("An API error occurred: %s", e)
+        return None
+
+def fetch_playlist_videos(youtube, published_after_str=None):
+    """Pages through the playlist with the blocking client; returns the PlaylistPager (rows in video_data)."""
+    pager = PlaylistPager(published_after_str)
+    while not pager.done:
+        logger.debug("Fetching page %d with token: %s", pager.pages_fetched + 1, pager.page_token)
+        playlist_response = fetch_playlist_page(youtube, pager.page_token)
+        if playlist_response is None:
+            pager.stop(failed=True)
+        else:
+            pager.add_page(playlist_response)
+    return pager
+
 def parse_videos(playlist_results, video_data_list): 
-    # The 'items' key is still present in the dictionary returned by the modified fetchVideosFromPlaylist
-    for video in playlist_results.get('items', []): 
+    """Appends a row per playlist item to video_data_list and returns how many were parsed."""
+    items = playlist_results.get('items', [])
+    # playlist_results is a filter_playlist_page result
+    for video in items: 
         title = video['snippet']['title']
         video_id = video['contentDetails']['videoId']
-        print(f"Title: {title}\nVideo ID: {video_id}\n")
+        logger.debug("Parsed video %s: %s", video_id, title)
         content_details = video['contentDetails']
 
         date_str = content_details['videoPublishedAt']
@@ -101,9 +160,12 @@ def parse_videos(playlist_results, video_data_list):
             "date_added_to_db": None
         }) 
 
+    return len(items)
+
 
 
 def testBedMain(custom_date=None): 
+    """Fetches, filters and enriches playlist videos and syncs the sheet; returns True on success."""
     os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"
 
     api_key = os.getenv("API_KEY")
@@ -112,83 +174,72 @@ def testBedMain(custom_date=None):
         YOUTUBE_API_VERSION,     
         developerKey=api_key)
     
-    video_data = []
-    current_page_token = None
-    processed_videos_set = set()
-
     # Define target start date
     published_after_filter_date = custom_date if custom_date else DEFAULT_PUBLISHED_AFTER_DATE
-    pages_fetched = 0
-
-    while pages_fetched < MAX_PAGES_TO_FETCH: 
-        print(f"Fetching page {pages_fetched + 1} for testBedMain with token: {current_page_token}")
-        fetch_result = fetchVideosFromPlaylist(youtube,
-                                               pageToken=current_page_token,
-                                               proccessed_videos=processed_videos_set,
-                                               published_after_str=published_after_filter_date)
-        
-        if not fetch_result:
-            print("Error fetching videos for testBedMain. Stopping.")
-            break
-
-        if fetch_result.get('items'):
-            parse_videos(fetch_result, video_data)
-        
-        processed_videos_set = fetch_result['processed_videos_set']
-        current_page_token = fetch_result.get('nextPageToken')
-
-        pages_fetched += 1
-        
-        if not current_page_token:
-            print("No more pages to fetch for testBedMain (end of playlist or date filter).")
-            break
-
-        if pages_fetched >= MAX_PAGES_TO_FETCH:
-            print(f"Reached max page fetch limit of {MAX_PAGES_TO_FETCH} for testBedMain.")
-            break
+    pager = fetch_playlist_videos(youtube, published_after_filter_date)
+    if pager.failed and not pager.video_data:
+        logger.error("Could not fetch any playlist videos. Stopping.")
+        return False
+    video_data = pager.video_data
     
     video_data.sort(key=lambda x: x['date'], reverse=True)
     df = pd.DataFrame(video_data)
     filtered_df = fuzzy_filter_videos(df)
-    print("--- \n Filtered DF \n --- \n", filtered_df)
-    update_video_sheet(filtered_df)
-
-def fuzzy_filter_videos(videos, threshold=80):
-    filtered_videos = []
-    
-    for _, video in videos.iterrows():
-        title = video['title'].lower()
-        matched_games = set()
-        
-        for game, keywords in VIDEO_FILTER.items():
-            for keyword in keywords:
-                score = fuzz.partial_ratio(keyword.lower(), title)
-                if score > threshold:
-                    matched_games.add(game)
-                    if(game == "Lethal Company"): 
-                        print(f"{Fore.CYAN}Matched '{keyword}' in title '{title}' with score {score}{Style.RESET_ALL}")
-        print(f'Matched games for {title}: {matched_games}')
-        
-        if matched_games:
-            video = video.copy()  # Avoid SettingWithCopyWarning
-            video['games'] = ', '.join(sorted(matched_games))
-            filtered_videos.append(video)
+    filtered_df = enrich_videos(youtube, filtered_df)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("--- \n Filtered DF \n --- \n%s", filtered_df)
+    return update_video_sheet(filtered_df)
+
+def fuzzy_filter_videos(videos, threshold=80, workers=None):
+    """
+    Keeps videos whose title fuzzily matches a VIDEO_FILTER keyword and adds a 'games' column.
+
+    Args:
+        videos (pd.DataFrame): Videos with a 'title' column.
+        threshold (int): Minimum partial_ratio score (exclusive) for a keyword to match.
+        workers (int): Worker processes for large batches (see classify.classify_titles_sharded).
+    """
+    if videos.empty or 'title' not in videos.columns:
+        return pd.DataFrame()
+
+    compiled = compile_keywords()
+    masks = classify_titles_sharded(videos['title'].tolist(), compiled, threshold, workers)
+    matched = masks != 0
+
+    filtered_videos = videos[matched].assign(games=decode_game_masks(masks[matched], compiled.games))
+    if logger.isEnabledFor(logging.DEBUG):
+        for title, games in zip(filtered_videos['title'], filtered_videos['games']):
+            logger.debug("Matched games for %s: %s", title, games)
     
-    return pd.DataFrame(filtered_videos)
+    logger.info("Fuzzy filter matched %d of %d videos.", len(filtered_videos), len(videos))
+    return filtered_videos
 
-def display_dashboard_stats():
-    """Fetches and displays dashboard statistics in a formatted way."""
-    dashboard_df = fetch_dashboard_stats()
-    
-    if dashboard_df is None:
-        print(f"{Fore.RED}Failed to fetch dashboard statistics. Try running option 1 first to populate the dashboard.{Style.RESET_ALL}")
+def display_dashboard_stats(refresh=False):
+    """
+    Computes and displays dashboard statistics in a formatted way.
+
+    Stats are computed locally from the cached snapshot of the main sheet; the sheet is only
+    read when the snapshot is stale or missing, or when refresh is True.
+    """
+    videos_df, data_as_of, source = get_video_data(refresh=refresh)
+
+    if videos_df is None:
+        print(f"{Fore.RED}Failed to fetch video data for dashboard statistics. Try running option 1 first to populate the sheet.{Style.RESET_ALL}")
         return
-    
-    if dashboard_df.empty:
-        print(f"{Fore.YELLOW}Dashboard sheet exists but contains no data.{Style.RESET_ALL}")
+
+    if videos_df.empty:
+        print(f"{Fore.YELLOW}Main sheet exists but contains no data.{Style.RESET_ALL}")
         return
-    
+
+    stats = compute_dashboard_stats(videos_df, updated_at=data_as_of)
+    dashboard_df = stats["summary"]
+
     print(f"\n{Fore.CYAN}=== Dashboard Statistics ==={Style.RESET_ALL}")
+    if source == SOURCE_STALE_CACHE:
+        source_color, source_note = Fore.YELLOW, "stale local snapshot, sheet unavailable"
+    else:
+        source_color, source_note = Fore.GREEN, "local snapshot" if source == SOURCE_CACHE else "sheet"
+    print(f"{source_color}Data as of {data_as_of.strftime('%Y-%m-%d %H:%M:%S')} ({source_note}){Style.RESET_ALL}")
     
     # Format the display for better readability
     # Set Pandas display options for better formatting
@@ -218,6 +269,16 @@ def display_dashboard_stats():
     else:
         # Fallback to standard DataFrame display if structure is different
         print(dashboard_df)
+
+    print(f"\n{Fore.CYAN}--- Videos per Game by Week ---{Style.RESET_ALL}")
+    if stats["weekly_game_counts"].empty:
+        print(f"{Fore.YELLOW}No videos published in the last few weeks.{Style.RESET_ALL}")
+    else:
+        print(stats["weekly_game_counts"])
+
+    print(f"\n{Fore.CYAN}--- Backlog Not Marked 'added_to_db' (by Age) ---{Style.RESET_ALL}")
+    for _, row in stats["backlog_by_age"].iterrows():
+        print(f"{Fore.GREEN}{row['Age']}: {row['Videos']}{Style.RESET_ALL}")
     
     # Reset Pandas display options
     pd.reset_option('display.max_rows')
@@ -226,23 +287,34 @@ def display_dashboard_stats():
     pd.reset_option('display.colheader_justify')
     pd.reset_option('display.precision')
 
+def run_test_bed_main(custom_date=None):
+    """Runs testBedMain under the run lock, waiting for (and reusing) an in-flight run for the same date."""
+    run_record = coordinated_run("testBedMain", testBedMain, custom_date, on_busy=ON_BUSY_WAIT)
+    if run_record["status"] == STATUS_REUSED:
+        print(f"{Fore.GREEN}Another run for the same date finished while waiting; its result was reused.{Style.RESET_ALL}")
+    elif run_record["status"] == STATUS_TIMEOUT:
+        print(f"{Fore.RED}Timed out waiting for another run to finish. Please try again later.{Style.RESET_ALL}")
+    elif run_record["status"] == STATUS_FAILED:
+        print(f"{Fore.RED}Fetch and update failed; see the log for details.{Style.RESET_ALL}")
+
 def interactive_menu():
     """Displays an interactive menu to the user."""
     colorama_init(autoreset=True)  # Initialize colorama
     while True:
         print(f"\n{Fore.CYAN}--- RDC Video Bot Menu ---{Style.RESET_ALL}")
         print(f"{Fore.GREEN}1. Fetch and update videos (current default behavior){Style.RESET_ALL}")
-        print(f"{Fore.GREEN}2. Fetch stats from dashboard{Style.RESET_ALL}")
+        print(f"{Fore.GREEN}2. Show dashboard stats (cached){Style.RESET_ALL}")
         print(f"{Fore.GREEN}3. Fetch videos from a specific date{Style.RESET_ALL}")
-        print(f"{Fore.RED}4. Exit{Style.RESET_ALL}")
+        print(f"{Fore.GREEN}4. Refresh dashboard stats from sheet{Style.RESET_ALL}")
+        print(f"{Fore.RED}5. Exit{Style.RESET_ALL}")
 
-        choice = input(f"{Fore.BLUE}Enter your choice (1-4): {Style.RESET_ALL}")
+        choice = input(f"{Fore.BLUE}Enter your choice (1-5): {Style.RESET_ALL}")
 
         if choice == '1':
             print(f"{Fore.GREEN}Running: Fetch and update videos...{Style.RESET_ALL}")
-            testBedMain()
+            run_test_bed_main()
         elif choice == '2':
-            print(f"{Fore.YELLOW}Fetching stats from dashboard...{Style.RESET_ALL}")
+            print(f"{Fore.YELLOW}Computing dashboard stats...{Style.RESET_ALL}")
             display_dashboard_stats()
         elif choice == '3':
             date_input = input(f"{Fore.BLUE}Enter the date to fetch videos from (YYYY-MM-DD): {Style.RESET_ALL}")
@@ -250,14 +322,18 @@ def interactive_menu():
                 # Validate the date format
                 datetime.strptime(date_input, "%Y-%m-%d")
                 print(f"{Fore.GREEN}Fetching videos from {date_input}...{Style.RESET_ALL}")
-                testBedMain(custom_date=date_input)
+                run_test_bed_main(custom_date=date_input)
             except ValueError:
                 print(f"{Fore.RED}Invalid date format. Please use YYYY-MM-DD format (e.g. 2025-06-10){Style.RESET_ALL}")
         elif choice == '4':
+            print(f"{Fore.YELLOW}Refreshing dashboard stats from the sheet...{Style.RESET_ALL}")
+            display_dashboard_stats(refresh=True)
+        elif choice == '5':
             print(f"{Fore.RED}Exiting.{Style.RESET_ALL}")
             break
         else:
             print(f"{Fore.RED}Invalid choice. Please try again.{Style.RESET_ALL}")
 
 if __name__ == "__main__":
+    setup_logging(interactive=True)
     interactive_menu()
\ No newline at end of file
@@ -0,0 +1,225 @@
+"""
+File-lock based coordination so only one fetch-and-update run touches the sheet at a time.
+
+The first invocation creates RUN_STATE_DIR/run.lock (O_CREAT | O_EXCL) describing itself and
+writes its outcome to RUN_STATE_DIR/last_run.json when it finishes. A concurrent invocation
+either exits immediately with a 'busy' status, or waits for the lock and, if the finished run
+had the same name and positional arguments, reuses its recorded result instead of repeating
+the work.
+Locks left behind by crashed runs are detected and broken: a lock from this host is stale
+once its PID is dead, however long the run has been going; a lock from another host (or on a
+platform where the PID cannot be checked) is stale once its heartbeat, which touches the lock
+file every RUN_LOCK_HEARTBEAT_SECONDS while the run is alive, is older than RUN_LOCK_STALE_SECONDS.
+"""
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from config import (
+    RUN_STATE_DIR, RUN_LOCK_STALE_SECONDS, RUN_LOCK_HEARTBEAT_SECONDS, RUN_LOCK_POLL_SECONDS,
+    RUN_LOCK_WAIT_TIMEOUT_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+LOCK_PATH = os.path.join(RUN_STATE_DIR, "run.lock")
+RESULT_PATH = os.path.join(RUN_STATE_DIR, "last_run.json")
+
+# Statuses returned by coordinated_run
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+STATUS_REUSED = "reused"
+STATUS_BUSY = "busy"
+STATUS_TIMEOUT = "timeout"
+
+ON_BUSY_WAIT = "wait"
+ON_BUSY_SKIP = "skip"
+
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as json_file:
+            return json.load(json_file)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        # Lock file caught between creation and write, or truncated by a crash
+        return {}
+
+
+def _write_json_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as json_file:
+        json.dump(data, json_file)
+    os.replace(tmp_path, path)
+
+
+def _try_acquire(holder):
+    """Creates the lock file for holder; returns False if another run holds it."""
+    if not os.path.exists(RUN_STATE_DIR):
+        os.makedirs(RUN_STATE_DIR, exist_ok=True)
+    try:
+        fd = os.open(LOCK_PATH, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, "w", encoding="utf-8") as lock_file:
+        json.dump(holder, lock_file)
+    return True
+
+
+def _release(holder):
+    current = _read_json(LOCK_PATH)
+    if current and current.get("run_id") == holder["run_id"]:
+        os.remove(LOCK_PATH)
+    else:
+        logger.warning("Run lock no longer belongs to run %s; leaving it in place.", holder["run_id"])
+
+
+def _pid_alive(pid):
+    """Whether pid is running on this host, or None if that cannot be checked here."""
+    if os.name != "posix":
+        # os.kill would terminate the process on Windows; rely on the heartbeat age there
+        return None
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _is_stale(holder):
+    try:
+        age_seconds = time.time() - os.path.getmtime(LOCK_PATH)
+    except FileNotFoundError:
+        return False
+    if not holder:
+        # Unreadable lock: give its writer a poll interval to finish before treating it as crashed
+        return age_seconds > RUN_LOCK_POLL_SECONDS
+    if holder.get("host") == socket.gethostname():
+        alive = _pid_alive(holder.get("pid", -1))
+        if alive is not None:
+            # A live owner keeps its lock however long the run takes (long backfills, API backoff)
+            return not alive
+    return age_seconds > RUN_LOCK_STALE_SECONDS
+
+
+def _break_stale_lock(holder):
+    """Removes a stale lock, making sure a fresh lock taken in the meantime is not removed instead."""
+    stale_path = f"{LOCK_PATH}.{os.getpid()}.stale"
+    try:
+        os.replace(LOCK_PATH, stale_path)
+    except FileNotFoundError:
+        return
+    moved = _read_json(stale_path) or {}
+    if holder and moved.get("run_id") != holder.get("run_id"):
+        # Another process replaced the lock after we judged it stale; put it back
+        try:
+            os.link(stale_path, LOCK_PATH)
+        except FileExistsError:
+            pass
+    os.remove(stale_path)
+
+
+def coordinated_run(run_name, run_fn, *args, on_busy=ON_BUSY_SKIP, wait_timeout=RUN_LOCK_WAIT_TIMEOUT_SECONDS, **kwargs):
+    """
+    Runs run_fn(*args, **kwargs) unless another coordinated run is in flight.
+
+    Args:
+        run_name (str): Identifies the kind of run; results are only reused between runs with the
+                        same name and positional arguments (keyword arguments are options like
+                        logging verbosity and do not affect reuse).
+        run_fn (callable): The work to run. It must return a truthy, JSON serializable value on success;
+                           a falsy return (or an exception) records the run as failed, and failed runs
+                           are never reused.
+        on_busy (str): ON_BUSY_SKIP to return immediately, or ON_BUSY_WAIT to wait for the other run.
+        wait_timeout (float): Maximum seconds to wait when on_busy is ON_BUSY_WAIT.
+
+    Returns:
+        dict: Run record with 'status' (one of the STATUS_* constants) and, when available,
+              'result', 'run_id', 'started_at' and 'finished_at'.
+    """
+    run_args = json.loads(json.dumps(list(args), default=str))
+    waited_for = None
+    wait_started = time.time()
+
+    while True:
+        holder = {
+            "run_id": uuid.uuid4().hex,
+            "run_name": run_name,
+            "args": run_args,
+            "pid": os.getpid(),
+            "host": socket.gethostname(),
+            "started_at": time.time(),
+        }
+        if _try_acquire(holder):
+            return _run_holding_lock(holder, run_fn, args, kwargs)
+
+        current = _read_json(LOCK_PATH)
+        if current is None:
+            # Released between our attempt and the read
+            continue
+        if _is_stale(current):
+            logger.warning("Breaking stale run lock held by %s (pid %s on %s).",
+                           current.get("run_name", "unknown run"), current.get("pid"), current.get("host"))
+            _break_stale_lock(current)
+            continue
+
+        if on_busy == ON_BUSY_SKIP:
+            logger.warning("Another run (%s, pid %s) is in progress; skipping.", current.get("run_name"), current.get("pid"))
+            return {"status": STATUS_BUSY, "holder": current}
+
+        if current.get("run_id") and current.get("run_id") != (waited_for or {}).get("run_id"):
+            waited_for = current
+            logger.info("Another run (%s, pid %s) is in progress; waiting for it to finish.",
+                        current.get("run_name"), current.get("pid"))
+
+        while os.path.exists(LOCK_PATH) and not _is_stale(_read_json(LOCK_PATH)):
+            if time.time() - wait_started > wait_timeout:
+                logger.warning("Timed out after %.0f seconds waiting for the run lock.", wait_timeout)
+                return {"status": STATUS_TIMEOUT, "holder": _read_json(LOCK_PATH)}
+            time.sleep(RUN_LOCK_POLL_SECONDS)
+
+        last_run = _read_json(RESULT_PATH) or {}
+        if (waited_for and last_run.get("run_id") == waited_for.get("run_id")
+                and last_run.get("status") == STATUS_COMPLETED and last_run.get("result")
+                and last_run.get("run_name") == run_name and last_run.get("args") == run_args):
+            logger.info("Reusing the result of run %s, which finished while we waited.", last_run["run_id"])
+            return dict(last_run, status=STATUS_REUSED)
+
+
+def _heartbeat(holder, stop_event):
+    """Touches the lock file while the run is alive, so its age only grows once the run has died."""
+    while not stop_event.wait(RUN_LOCK_HEARTBEAT_SECONDS):
+        current = _read_json(LOCK_PATH)
+        if not current or current.get("run_id") != holder["run_id"]:
+            logger.warning("Run lock no longer belongs to run %s; stopping its heartbeat.", holder["run_id"])
+            return
+        try:
+            os.utime(LOCK_PATH)
+        except FileNotFoundError:
+            return
+
+
+def _run_holding_lock(holder, run_fn, args, kwargs):
+    record = dict(holder)
+    stop_heartbeat = threading.Event()
+    threading.Thread(target=_heartbeat, args=(holder, stop_heartbeat), name="run-lock-heartbeat", daemon=True).start()
+    try:
+        record["result"] = run_fn(*args, **kwargs)
+        record["status"] = STATUS_COMPLETED if record["result"] else STATUS_FAILED
+        return record
+    except BaseException:
+        record["status"] = STATUS_FAILED
+        raise
+    finally:
+        stop_heartbeat.set()
+        record["finished_at"] = time.time()
+        try:
+            _write_json_atomic(RESULT_PATH, json.loads(json.dumps(record, default=str)))
+        finally:
+            _release(holder)
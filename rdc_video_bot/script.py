@@ -2,54 +2,28 @@ import os
 import googleapiclient.discovery
 import pandas as pd
 from dotenv import load_dotenv
-from main import fetchVideosFromPlaylist, parse_videos, fuzzy_filter_videos
+from main import fetch_playlist_videos, fuzzy_filter_videos
 from sheet import update_video_sheet
-from config import YOUTUBE_API_SERVICE_NAME, YOUTUBE_API_VERSION, MAX_PAGES_TO_FETCH
+from enrichment import enrich_videos
+from ingest_async import run_ingestion, ASYNC_INGESTION_AVAILABLE
+from config import YOUTUBE_API_SERVICE_NAME, YOUTUBE_API_VERSION
+from bot_logging import setup_logging
+from run_lock import coordinated_run, ON_BUSY_SKIP, ON_BUSY_WAIT, STATUS_BUSY, STATUS_TIMEOUT, STATUS_FAILED
 from datetime import datetime, timedelta
+import argparse
+import asyncio
 import logging
-from logging.handlers import RotatingFileHandler
+import sys
 
 
 # Load environment variables from .env file
 load_dotenv()
 
-def setup_logging(log_dir="logs"):
-    """Configure logging to both console and file with rotation."""
-    # Create logs directory if it doesn't exist
-    if not os.path.exists(log_dir):
-        os.makedirs(log_dir)
-        
-    # Generate log filename with date
-    log_filename = os.path.join(log_dir, f"video_bot_{datetime.now().strftime('%Y-%m-%d')}.log")
-    
-    # Configure root logger
-    logger = logging.getLogger()
-    logger.setLevel(logging.INFO)
-    
-    # Clear any existing handlers (important for repeated runs)
-    if logger.hasHandlers():
-        logger.handlers.clear()
-    
-    # Create file handler for logging to file
-    file_handler = RotatingFileHandler(
-        log_filename, maxBytes=10*1024*1024, backupCount=5
-    )
-    file_format = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-    file_handler.setFormatter(file_format)
-    
-    # Create console handler for logging to console
-    console_handler = logging.StreamHandler()
-    console_handler.setFormatter(file_format)
-    
-    # Add both handlers to the logger
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
-    
-    logging.info(f"Logging initialized. Log file: {log_filename}")
-    return logger
+logger = logging.getLogger(__name__)
 
 # TODO: Update dashboard as well 
-def standard_video_script(published_after_date_str: str):
+def standard_video_script(published_after_date_str: str, quiet: bool = False, verbose: bool = False, workers: int = None,
+                          use_async: bool = False, configure_logging: bool = True):
     """
     Fetches YouTube videos from a playlist published after a specific date,
     filters them, and updates a Google Sheet.
@@ -57,14 +31,32 @@ def standard_video_script(published_after_date_str: str):
 
     Args:
         published_after_date_str: The date string (YYYY-MM-DD) after which videos should be fetched.
+        quiet: Batch mode; only warnings and errors are written to the console.
+        verbose: Log per-video DEBUG events (parsed videos, fuzzy matches).
+        workers: Worker processes for title classification (defaults to config.CLASSIFY_WORKERS, 0 = all cores).
+        use_async: Run the asyncio ingestion path (ingest_async.run_ingestion) instead of the blocking clients.
+        configure_logging: Call setup_logging(quiet, verbose); pass False when the caller has already set up logging.
+
+    Returns:
+        bool: True if the run succeeded (including when there was nothing new to write), False on failure.
     """
-    logger = setup_logging()
+    if configure_logging:
+        setup_logging(quiet=quiet, verbose=verbose)
     os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"
 
     api_key = os.getenv("API_KEY")
     if not api_key:
         logger.error("API_KEY not found. Make sure it's set in your .env file or environment variables.")
-        return
+        return False
+
+    if use_async:
+        try:
+            summary = asyncio.run(run_ingestion(published_after_date_str, workers=workers))
+        except Exception as e:
+            logger.exception("Error during async ingestion: %s", e)
+            return False
+        logger.info("Async ingestion summary: %s", summary)
+        return True
 
     try:
         youtube = googleapiclient.discovery.build(
@@ -73,84 +65,91 @@ def standard_video_script(published_after_date_str: str):
             developerKey=api_key
         )
     except Exception as e:
-        logger.error(f"Error building YouTube client: {e}")
-        return
-
-    video_data = []
-    current_page_token = None
-    processed_videos_set = set()
-    pages_fetched = 0
-
-    logger.info(f"Starting video fetch for standard_video_script, for videos published after: {published_after_date_str}")
+        logger.error("Error building YouTube client: %s", e)
+        return False
 
-    while pages_fetched < MAX_PAGES_TO_FETCH:
-        logger.info(f"Fetching page {pages_fetched + 1} with token: {current_page_token if current_page_token else 'None'}")
-        
-        fetch_result = fetchVideosFromPlaylist(
-            youtube,
-            pageToken=current_page_token,
-            proccessed_videos=processed_videos_set,
-            published_after_str=published_after_date_str  # Use the function parameter here
-        )
-
-        if not fetch_result:
-            logger.warning("fetchVideosFromPlaylist returned no result. Stopping.")
-            break
-        
-        items_on_page = fetch_result.get('items')
-        if items_on_page:
-            parse_videos(fetch_result, video_data)
-        else:
-            # This can happen if the date filter stops fetching early on a page, or API error.
-            # fetchVideosFromPlaylist prints errors for HttpError.
-            logger.warning("No items found on this page or an error occurred in fetchVideosFromPlaylist.")
-
-        processed_videos_set = fetch_result.get('processed_videos_set', processed_videos_set)
-        current_page_token = fetch_result.get('nextPageToken')
-        pages_fetched += 1
-
-        if not current_page_token:
-            logger.info("No more pages to fetch (end of playlist or date filter met).")
-            break
-
-        if pages_fetched >= MAX_PAGES_TO_FETCH:
-            logger.info(f"Reached max page fetch limit of {MAX_PAGES_TO_FETCH}.")
-            break
+    logger.info("Starting video fetch for standard_video_script, for videos published after: %s", published_after_date_str)
+    pager = fetch_playlist_videos(youtube, published_after_date_str)
+    if pager.failed and not pager.video_data:
+        logger.error("Could not fetch any playlist videos. Exiting standard_video_script.")
+        return False
+    video_data = pager.video_data
 
     if not video_data:
         logger.info("No videos fetched. Exiting standard_video_script.")
-        return
+        return True
 
     video_data.sort(key=lambda x: x['date'], reverse=True)
     df = pd.DataFrame(video_data)
 
     if df.empty:
         logger.info("DataFrame is empty after fetching and parsing. No videos to process.")
-        return
+        return True
     
-    logger.info(f"--- \n Original DF ({len(df)} videos) \n --- \n {df.head()}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("--- \n Original DF (%d videos) \n --- \n %s", len(df), df.head())
     
-    filtered_df = fuzzy_filter_videos(df) 
+    filtered_df = fuzzy_filter_videos(df, workers=workers)
     
     if filtered_df.empty:
         logger.info("Filtered DataFrame is empty. No videos to update in the sheet.")
-        return
+        return True
+
+    filtered_df = enrich_videos(youtube, filtered_df)
         
-    logger.info(f"--- \n Filtered DF ({len(filtered_df)} videos) \n --- \n {filtered_df.head()}")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("--- \n Filtered DF (%d videos) \n --- \n %s", len(filtered_df), filtered_df.head())
     
-    try:
-        update_video_sheet(filtered_df)
-        logger.info("standard_video_script completed successfully.")
-    except Exception as e:
-        logger.error(f"Error during update_video_sheet: {e}")
+    if not update_video_sheet(filtered_df):
+        logger.error("standard_video_script failed to update the sheet.")
+        return False
+    logger.info("standard_video_script completed successfully.")
+    return True
+
+# Exit code for a run skipped or timed out because another run held the lock (EX_TEMPFAIL)
+EXIT_RUN_IN_PROGRESS = 75
+
+def run_standard_video_script(published_after_date_str: str, on_busy: str = ON_BUSY_SKIP, **options):
+    """
+    Runs standard_video_script under the run lock, so overlapping launches (e.g. cron firing while
+    a previous run is still backing off the Sheets API) do not fetch and rewrite the sheet twice.
+
+    Args:
+        published_after_date_str: The date string (YYYY-MM-DD) after which videos should be fetched.
+        on_busy: ON_BUSY_SKIP to exit immediately, or ON_BUSY_WAIT to wait for the in-flight run
+                 and reuse its result if it was for the same date.
+        **options: Passed through to standard_video_script.
+
+    Returns:
+        dict: The run record from run_lock.coordinated_run.
+    """
+    return coordinated_run("standard_video_script", standard_video_script, published_after_date_str,
+                           on_busy=on_busy, **options)
 
 # Example of how to run this script (optional, for testing):
 if __name__ == "__main__":
-    logger = setup_logging() # Setup logging for direct script run as well
-    import sys
-    if len(sys.argv) > 1:
-        date_param = sys.argv[1]
-    else:
-        date_param = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
-    logger.info(f"Testing standard_video_script with date: {date_param}")
-    standard_video_script(date_param)
+    parser = argparse.ArgumentParser(description="Fetch new playlist videos and update the tracker sheet.")
+    parser.add_argument("date", nargs="?", default=(datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d"),
+                        help="Fetch videos published after this date (YYYY-MM-DD). Defaults to yesterday.")
+    parser.add_argument("--quiet", action="store_true", help="Batch mode: only warnings and errors on the console.")
+    parser.add_argument("--verbose", action="store_true", help="Log every parsed video and fuzzy match.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes for title classification (0 = one per CPU core).")
+    parser.add_argument("--wait", action="store_true",
+                        help="If another run is in progress, wait for it (reusing its result for the same date) "
+                             f"instead of exiting with status {EXIT_RUN_IN_PROGRESS}.")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Use the asyncio ingestion path (overlaps YouTube and Sheets calls; needs the 'async' extra).")
+    args = parser.parse_args()
+    if args.use_async and not ASYNC_INGESTION_AVAILABLE:
+        parser.error("--async needs httpx; install it with 'poetry install -E async'.")
+
+    # Configured once, here, so the run lock's messages are logged too; standard_video_script must not redo it
+    setup_logging(quiet=args.quiet, verbose=args.verbose)
+    run_record = run_standard_video_script(args.date, on_busy=ON_BUSY_WAIT if args.wait else ON_BUSY_SKIP,
+                                           workers=args.workers, use_async=args.use_async, configure_logging=False)
+    logger.info("Run finished with status: %s", run_record["status"])
+    if run_record["status"] in (STATUS_BUSY, STATUS_TIMEOUT):
+        sys.exit(EXIT_RUN_IN_PROGRESS)
+    if run_record["status"] == STATUS_FAILED:
+        sys.exit(1)
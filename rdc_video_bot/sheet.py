@@ -1,140 +1,148 @@
+from numbers import Real
 import gspread
-from gspread_dataframe import get_as_dataframe, set_with_dataframe
+from gspread.utils import rowcol_to_a1
+import numpy as np
 import pandas as pd
-from config import SPREADSHEET_NAME
+from config import SPREADSHEET_NAME, DASHBOARD_SHEET_NAME, SHEET_IO_CHUNK_ROWS, VIDEO_SNAPSHOT_PATH
+from enrichment import METADATA_COLUMNS
 from datetime import datetime # Added import
-import traceback # Added for more detailed error logging
+import logging
+import os
 
-def update_dashboard_sheet(gc, videos_df_original): # gc is gspread client, videos_df is the dataframe from main sheet
+logger = logging.getLogger(__name__)
+
+def build_dashboard_dataframe(videos_df, updated_at=None):
+    """
+    Computes the dashboard statistics for the main sheet's videos.
+
+    Args:
+        videos_df (pd.DataFrame): Video data as written to (or read from) the main sheet. Not modified.
+        updated_at (datetime): Timestamp shown as 'Last Dashboard Update'; defaults to now.
+
+    Returns:
+        pd.DataFrame: Two columns, 'Statistic' and 'Value', in display order.
+    """
+    # Initialize statistics
+    total_videos = 0
+    videos_in_db_count = 0
+    videos_not_in_db_count = 0
+    latest_video_title = "N/A"
+    latest_video_date_str = "N/A"
+    oldest_video_title = "N/A"
+    oldest_video_date_str = "N/A"
+    timespan_days = None
+    unique_ids_count = None
+    game_counts = pd.Series(dtype=int) # For storing counts of each game
+
+    if not videos_df.empty:
+        # Remove any fully empty rows, then count the remaining rows
+        videos_df = videos_df.dropna(how='all')
+        total_videos = len(videos_df)
+
+        if 'added_to_db' in videos_df.columns:
+            # Compare as strings, as the column comes from main sheet processing
+            videos_in_db_count = int((videos_df['added_to_db'].astype(str).str.upper() == 'TRUE').sum())
+        else:
+            logger.warning("Dashboard: 'added_to_db' column missing in DataFrame.")
+        videos_not_in_db_count = total_videos - videos_in_db_count
+
+        if 'date' in videos_df.columns and not videos_df['date'].isna().all():
+            # Convert dates without writing back into the caller's DataFrame, dropping failed conversions (NaT)
+            valid_dates = pd.to_datetime(videos_df['date'], errors='coerce').dropna()
+
+            if not valid_dates.empty:
+                latest_idx = valid_dates.idxmax()
+                latest_video_title = videos_df.at[latest_idx, 'title'] if 'title' in videos_df.columns else "N/A"
+                latest_video_date_str = valid_dates[latest_idx].strftime("%Y-%m-%d %H:%M:%S")
+
+                oldest_idx = valid_dates.idxmin()
+                oldest_video_title = videos_df.at[oldest_idx, 'title'] if 'title' in videos_df.columns else "N/A"
+                oldest_video_date_str = valid_dates[oldest_idx].strftime("%Y-%m-%d %H:%M:%S")
+
+                # Timespan is 0 when there is only one unique date
+                timespan_days = (valid_dates.max() - valid_dates.min()).days
+            else:
+                logger.warning("Dashboard: No valid dates found in 'date' column after conversion.")
+        else:
+            logger.warning("Dashboard: 'date' column missing or contains all invalid date values.")
+
+        if 'video_id' in videos_df.columns:
+            unique_ids_count = videos_df['video_id'].nunique()
+        else:
+            logger.warning("Dashboard: 'video_id' column missing in DataFrame.")
+
+        # Calculate game statistics
+        if 'games' in videos_df.columns and not videos_df['games'].isna().all():
+            # Split comma-separated games and count them
+            game_counts = videos_df['games'].dropna().astype(str).str.split(',').explode().str.strip().value_counts()
+        else:
+            logger.warning("Dashboard: 'games' column missing or empty in DataFrame.")
+
+    # Prepare data for the dashboard sheet
+    dashboard_data_list = [
+        ("--- General Information ---", ""),
+        ("Last Dashboard Update", (updated_at or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")),
+        ("", ""), # Spacer
+        ("--- Video Statistics ---", ""),
+        ("Total Videos in Sheet", total_videos),
+        ("Videos Marked 'added_to_db'", videos_in_db_count),
+        ("Videos Not Marked 'added_to_db'", videos_not_in_db_count),
+    ]
+
+    if unique_ids_count is not None:
+        dashboard_data_list.append(("Unique Video IDs", unique_ids_count))
+
+    dashboard_data_list.extend([
+        ("", ""), # Spacer
+        ("--- Video Details (by Publication Date) ---", ""),
+        ("Latest Video Title", latest_video_title),
+        ("Latest Video Date", latest_video_date_str),
+        ("Oldest Video Title", oldest_video_title),
+        ("Oldest Video Date", oldest_video_date_str),
+    ])
+    
+    if timespan_days is not None:
+        dashboard_data_list.append(("Timespan of Videos (Days)", timespan_days))
+    
+    # Add game statistics to dashboard data
+    if not game_counts.empty:
+        dashboard_data_list.append(("", "")) # Spacer
+        dashboard_data_list.append(("--- Game Statistics ---", ""))
+        for game, count in game_counts.items():
+            dashboard_data_list.append((f"Videos for {game}", count))
+
+    return pd.DataFrame(dashboard_data_list, columns=["Statistic", "Value"])
+
+def dashboard_values(videos_df, updated_at=None):
+    """The Dashboard sheet's cell values (header row first) for the main sheet's videos."""
+    return dataframe_values(build_dashboard_dataframe(videos_df, updated_at), include_header=True)
+
+def update_dashboard_sheet(gc, videos_df): # gc is gspread client, videos_df is the dataframe from main sheet (read only)
     try:
-        print("Updating dashboard sheet...")
+        logger.info("Updating dashboard sheet...")
         sh = gc.open(SPREADSHEET_NAME) 
+        values = dashboard_values(videos_df)
+        total_rows, total_cols = len(values), len(values[0])
         try:
-            dashboard_sheet = sh.worksheet("Dashboard")
+            dashboard_sheet = sh.worksheet(DASHBOARD_SHEET_NAME)
         except gspread.exceptions.WorksheetNotFound:
-            print("Dashboard sheet not found, creating one.")
-            # Create with a reasonable number of rows for stats and 2 columns
-            dashboard_sheet = sh.add_worksheet(title="Dashboard", rows="20", cols="2")
-
-        videos_df = videos_df_original.copy() # Work with a copy to avoid modifying the original DataFrame
-
-        # Initialize statistics
-        total_videos = 0
-        videos_in_db_count = 0
-        videos_not_in_db_count = 0
-        latest_video_title = "N/A"
-        latest_video_date_str = "N/A"
-        oldest_video_title = "N/A"
-        oldest_video_date_str = "N/A"
-        timespan_days = None
-        unique_ids_count = None
-        game_counts = pd.Series(dtype=int) # For storing counts of each game
-
-        if not videos_df.empty:
-            # Remove any fully empty rows, then count the remaining rows
-            videos_df = videos_df.dropna(how='all')
-            total_videos = len(videos_df)
-            
-            if 'added_to_db' in videos_df.columns:
-                # Ensure the column is treated as string for comparison, as it comes from main sheet processing
-                videos_df['added_to_db'] = videos_df['added_to_db'].astype(str)
-                videos_in_db_count = videos_df[videos_df['added_to_db'].str.upper() == 'TRUE'].shape[0]
-            else:
-                print("Warning (Dashboard): 'added_to_db' column missing in DataFrame.")
-            videos_not_in_db_count = total_videos - videos_in_db_count
-
-            if 'date' in videos_df.columns and not videos_df['date'].isna().all():
-                # Convert 'date' column to datetime objects, coercing errors to NaT
-                videos_df['date'] = pd.to_datetime(videos_df['date'], errors='coerce')
-                # Filter out rows where date conversion failed (NaT)
-                valid_dates_df = videos_df.dropna(subset=['date'])
-                
-                if not valid_dates_df.empty:
-                    # Sort by date to easily get latest and oldest
-                    sorted_by_date_df = valid_dates_df.sort_values(by='date', ascending=False)
-                    
-                    latest_video_row = sorted_by_date_df.iloc[0]
-                    latest_video_title = latest_video_row.get('title', "N/A")
-                    latest_video_date_str = latest_video_row['date'].strftime("%Y-%m-%d %H:%M:%S")
-
-                    oldest_video_row = sorted_by_date_df.iloc[-1]
-                    oldest_video_title = oldest_video_row.get('title', "N/A")
-                    oldest_video_date_str = oldest_video_row['date'].strftime("%Y-%m-%d %H:%M:%S")
-                    
-                    # Calculate timespan if there's more than one unique date
-                    if len(valid_dates_df['date'].unique()) > 1:
-                        timespan_days = (valid_dates_df['date'].max() - valid_dates_df['date'].min()).days
-                    elif len(valid_dates_df['date'].unique()) == 1:
-                        timespan_days = 0 # Only one unique date, so timespan is 0
-                else:
-                    print("Warning (Dashboard): No valid dates found in 'date' column after conversion.")
-            else:
-                print("Warning (Dashboard): 'date' column missing or contains all invalid date values.")
+            logger.info("Dashboard sheet not found, creating one.")
+            dashboard_sheet = sh.add_worksheet(title=DASHBOARD_SHEET_NAME, rows=total_rows, cols=total_cols)
+        else:
+            # Sizing the grid to the data and writing every cell replaces the old contents without a clear call
+            dashboard_sheet.resize(rows=total_rows, cols=total_cols)
 
-            if 'video_id' in videos_df.columns:
-                unique_ids_count = videos_df['video_id'].nunique()
-            else:
-                print("Warning (Dashboard): 'video_id' column missing in DataFrame.")
-
-            # Calculate game statistics
-            if 'games' in videos_df.columns and not videos_df['games'].isna().all():
-                all_games_list = []
-                # Split comma-separated games and count them
-                for games_str in videos_df['games'].dropna():
-                    all_games_list.extend([game.strip() for game in games_str.split(',')])
-                if all_games_list:
-                    game_counts = pd.Series(all_games_list).value_counts()
-            else:
-                print("Warning (Dashboard): 'games' column missing or empty in DataFrame.")
-
-
-        # Prepare data for the dashboard sheet
-        dashboard_data_list = [
-            ("--- General Information ---", ""),
-            ("Last Dashboard Update", datetime.now().strftime("%Y-%m-%d %H:%M:%S")),
-            ("", ""), # Spacer
-            ("--- Video Statistics ---", ""),
-            ("Total Videos in Sheet", total_videos),
-            ("Videos Marked 'added_to_db'", videos_in_db_count),
-            ("Videos Not Marked 'added_to_db'", videos_not_in_db_count),
-        ]
-
-        if unique_ids_count is not None:
-            dashboard_data_list.append(("Unique Video IDs", unique_ids_count))
-
-        dashboard_data_list.extend([
-            ("", ""), # Spacer
-            ("--- Video Details (by Publication Date) ---", ""),
-            ("Latest Video Title", latest_video_title),
-            ("Latest Video Date", latest_video_date_str),
-            ("Oldest Video Title", oldest_video_title),
-            ("Oldest Video Date", oldest_video_date_str),
-        ])
-        
-        if timespan_days is not None:
-            dashboard_data_list.append(("Timespan of Videos (Days)", timespan_days))
-        
-        # Add game statistics to dashboard data
-        if not game_counts.empty:
-            dashboard_data_list.append(("", "")) # Spacer
-            dashboard_data_list.append(("--- Game Statistics ---", ""))
-            for game, count in game_counts.items():
-                dashboard_data_list.append((f"Videos for {game}", count))
-        
-        dashboard_df_to_write = pd.DataFrame(dashboard_data_list, columns=["Statistic", "Value"])
-        
-        # Clear the sheet and write the new dashboard data
-        dashboard_sheet.clear() 
-        set_with_dataframe(dashboard_sheet, dashboard_df_to_write, include_index=False, include_column_header=True, resize=True)
-        print("Dashboard sheet updated successfully.")
+        dashboard_sheet.update(range_name=f"A1:{rowcol_to_a1(total_rows, total_cols)}", values=values,
+                               value_input_option="USER_ENTERED")
+        logger.info("Dashboard sheet updated successfully.")
 
     except gspread.exceptions.APIError as e:
-        print(f"Error updating dashboard sheet (APIError): {str(e)}")
+        logger.error("Error updating dashboard sheet (APIError): %s", e)
         # Specific advice for rate limiting
         if hasattr(e, 'response') and e.response.status_code == 429:
-            print("This might be due to Google Sheets API rate limits. Consider adding delays if updates are frequent.")
+            logger.warning("This might be due to Google Sheets API rate limits. Consider adding delays if updates are frequent.")
     except Exception as e:
-        print(f"An unexpected error occurred while updating dashboard sheet: {str(e)}")
+        logger.error("An unexpected error occurred while updating dashboard sheet: %s", e)
 
 # Helper Functions for update_video_sheet
 
@@ -143,7 +151,7 @@ def _setup_google_sheets_connection():
     gc = gspread.service_account()
     spreadsheet = gc.open(SPREADSHEET_NAME)
     current_sheet = spreadsheet.sheet1
-    print(f"--- Connecting to Sheet: '{current_sheet.title}' in Spreadsheet: '{SPREADSHEET_NAME}' ---")
+    logger.info("--- Connecting to Sheet: '%s' in Spreadsheet: '%s' ---", current_sheet.title, SPREADSHEET_NAME)
     return gc, current_sheet
 
 def _normalize_dataframe_columns(df, df_name="DataFrame"):
@@ -165,51 +173,177 @@ def _normalize_dataframe_columns(df, df_name="DataFrame"):
     if 'date' in df.columns:
         df['date'] = pd.to_datetime(df['date'], errors='coerce')
         if df['date'].isna().any():
-            print(f"Warning ({df_name}): Some dates could not be parsed and were set to NaT.")
+            logger.warning("%s: Some dates could not be parsed and were set to NaT.", df_name)
     else:
-        print(f"Warning ({df_name}): 'date' column missing.")
+        logger.warning("%s: 'date' column missing.", df_name)
+
+    # Normalize 'view_count' (read back from the sheet as text)
+    if 'view_count' in df.columns:
+        df['view_count'] = pd.to_numeric(df['view_count'], errors='coerce')
         
     return df
 
-def _get_current_sheet_data(current_sheet):
-    """Fetches and prepares data from the current Google Sheet."""
-    current_df = get_as_dataframe(current_sheet, evaluate_formulas=True)
-    if current_df is None:
-        print("Info (Current Sheet): Sheet is truly empty, initializing as empty DataFrame.")
-        current_df = pd.DataFrame()
-    elif not current_df.empty:
-        current_df = current_df.dropna(how='all').reset_index(drop=True)
-        
-    return _normalize_dataframe_columns(current_df, "Current Sheet Data")
+# Chunked Sheet I/O
+#
+# Worksheets are read and written in blocks of SHEET_IO_CHUNK_ROWS rows so that no single
+# request carries the whole sheet and no full list-of-lists copy of the sheet is built.
+
+def cell_value(value):
+    """
+    Converts a DataFrame value to a cell value, as set_with_dataframe does with its defaults.
+
+    Values are written USER_ENTERED, which treats a leading apostrophe as a "text" marker and
+    drops it, so strings starting with one get a second apostrophe (string_escaping='default').
+    """
+    if isinstance(value, np.generic):
+        value = value.item()
+    if pd.isnull(value):
+        return ""
+    if isinstance(value, Real):
+        return value
+    value = str(value)
+    if value.startswith("'"):
+        return f"'{value}"
+    return value
+
+def dataframe_values(df, include_header=False):
+    """Converts df to a list of cell value rows, optionally preceded by its column names."""
+    values = [[str(column) for column in df.columns]] if include_header else []
+    values.extend([cell_value(value) for value in row] for row in df.itertuples(index=False, name=None))
+    return values
+
+def read_block_ranges(header_width, row_count, chunk_rows=SHEET_IO_CHUNK_ROWS):
+    """(first row, A1 range) pairs covering data rows 2..row_count of a worksheet in blocks of at most chunk_rows rows."""
+    return [
+        (first_row, f"{rowcol_to_a1(first_row, 1)}:{rowcol_to_a1(min(first_row + chunk_rows - 1, row_count), header_width)}")
+        for first_row in range(2, row_count + 1, chunk_rows)
+    ]
+
+class SheetRowsBuffer:
+    """
+    Collects a worksheet's data rows, block by block, into one preallocated array of cells.
+
+    Each block is copied in at its sheet position as soon as it is read, so the caller can drop it
+    before requesting the next one, and blocks may arrive in any order. The buffer holds one
+    reference per cell of the grid (row_count - 1 rows by len(header) columns); the cell strings
+    themselves are shared with the DataFrame built from it. Empty cells become NaN and fully
+    empty rows are dropped.
+    """
+
+    def __init__(self, header, row_count):
+        self.header = list(header)
+        data_rows = max(row_count - 1, 0)
+        self._cells = np.full((data_rows, len(self.header)), np.nan, dtype=object)
+        self._has_data = np.zeros(data_rows, dtype=bool)
+
+    def add_block(self, first_row, rows):
+        """Copies rows read from the sheet, starting at sheet row first_row (padding trimmed by the API)."""
+        width = len(self.header)
+        for index, row in enumerate(rows, start=first_row - 2):
+            for column, cell in enumerate(row[:width]):
+                if cell != "":
+                    self._cells[index, column] = cell
+                    self._has_data[index] = True
+
+    def to_dataframe(self):
+        """Returns the non-empty rows, in sheet order, as normalized main sheet data."""
+        # Move the non-empty rows up in place rather than building a filtered copy
+        kept = 0
+        for index in np.flatnonzero(self._has_data):
+            if index != kept:
+                self._cells[kept] = self._cells[index]
+            kept += 1
+
+        if not kept:
+            logger.info("Current Sheet: Sheet is truly empty, initializing as empty DataFrame.")
+            current_df = pd.DataFrame()
+        else:
+            current_df = pd.DataFrame(self._cells[:kept], columns=self.header, copy=False)
+        self._cells = self._has_data = None
+
+        return _normalize_dataframe_columns(current_df, "Current Sheet Data")
+
+def write_grid_size(df):
+    """The (rows, cols) grid that holds df below a header row."""
+    return len(df) + 1, max(len(df.columns), 1)
+
+def write_blocks(df, chunk_rows=SHEET_IO_CHUNK_ROWS):
+    """
+    Yields the writes of df (with a header row) to a worksheet as (A1 range, values) pairs.
+
+    The header comes first, then one pair per block of chunk_rows rows. A block's cell values
+    are only built when it is requested, so a caller that writes each block before asking for
+    the next never holds more than one.
+    """
+    _, total_cols = write_grid_size(df)
+    yield f"A1:{rowcol_to_a1(1, total_cols)}", [[str(column) for column in df.columns]]
+    for start in range(0, len(df), chunk_rows):
+        values = dataframe_values(df.iloc[start:start + chunk_rows])
+        first_row = start + 2
+        yield f"{rowcol_to_a1(first_row, 1)}:{rowcol_to_a1(first_row + len(values) - 1, total_cols)}", values
+
+def _write_df_in_chunks(worksheet, df, chunk_rows=SHEET_IO_CHUNK_ROWS):
+    """
+    Writes df (with a header row) to the worksheet in blocks of chunk_rows rows.
+
+    Existing cells are overwritten in place rather than cleared up front; the grid is then
+    resized to exactly fit df, which drops any stale rows/columns left from a larger sheet.
+    """
+    total_rows, total_cols = write_grid_size(df)
+
+    # Grow the grid first so every block lands inside it
+    if worksheet.row_count < total_rows or worksheet.col_count < total_cols:
+        worksheet.resize(rows=max(worksheet.row_count, total_rows), cols=max(worksheet.col_count, total_cols))
+
+    for block_range, values in write_blocks(df, chunk_rows):
+        worksheet.update(range_name=block_range, values=values, value_input_option="USER_ENTERED")
+
+    worksheet.resize(rows=total_rows, cols=total_cols)
+
+def _get_current_sheet_data(current_sheet, chunk_rows=SHEET_IO_CHUNK_ROWS):
+    """
+    Fetches and prepares data from the current Google Sheet, reading it in row blocks.
+
+    Row 1 is used as the header. Each block is copied into a SheetRowsBuffer before the next is requested.
+    """
+    header = current_sheet.row_values(1)
+    buffer = SheetRowsBuffer(header, current_sheet.row_count)
+    if header:
+        for first_row, block_range in read_block_ranges(len(header), current_sheet.row_count, chunk_rows):
+            buffer.add_block(first_row, current_sheet.get(block_range))
+    return buffer.to_dataframe()
 
 def _prepare_fetched_data(fetched_video_frame):
-    """Prepares the newly fetched video DataFrame."""
+    """Prepares the newly fetched video DataFrame. The frame is normalized in place, not copied."""
     if fetched_video_frame is None:
-        print("Warning (Fetched Data): fetched_video_frame is None. Returning empty DataFrame.")
+        logger.warning("Fetched Data: fetched_video_frame is None. Returning empty DataFrame.")
         return pd.DataFrame()
-    fetched_df = fetched_video_frame.copy()
-    return _normalize_dataframe_columns(fetched_df, "Fetched Video Data")
+    return _normalize_dataframe_columns(fetched_video_frame, "Fetched Video Data")
 
 def _merge_video_dataframes(current_df, fetched_df):
-    """Merges current and fetched video data, identifying new videos."""
+    """
+    Merges current and fetched video data, identifying new videos.
+
+    No defensive copies are made: the returned frames may be current_df or fetched_df themselves.
+    """
     new_videos_df = pd.DataFrame()
 
     if fetched_df.empty:
-        print("Info (Merge): Fetched data is empty. No new videos to process.")
-        return current_df.copy(), new_videos_df
+        logger.info("Merge: Fetched data is empty. No new videos to process.")
+        return current_df, new_videos_df
 
     if current_df.empty:
-        print("Info (Merge): Current sheet is empty. Adding all fetched videos as new.")
-        updated_df = fetched_df.copy()
-        new_videos_df = fetched_df.copy()
+        logger.info("Merge: Current sheet is empty. Adding all fetched videos as new.")
+        updated_df = fetched_df
+        new_videos_df = fetched_df
     else:
         if 'video_id' not in current_df.columns:
-            print("Warning (Merge): 'video_id' column missing in the current sheet. Appending all fetched videos.")
-            new_videos_df = fetched_df.copy()
+            logger.warning("Merge: 'video_id' column missing in the current sheet. Appending all fetched videos.")
+            new_videos_df = fetched_df
             updated_df = pd.concat([current_df, new_videos_df], ignore_index=True)
         elif 'video_id' not in fetched_df.columns:
-            print("Warning (Merge): 'video_id' column missing in fetched videos. No new videos can be added.")
-            updated_df = current_df.copy() # No changes
+            logger.warning("Merge: 'video_id' column missing in fetched videos. No new videos can be added.")
+            updated_df = current_df # No changes
         else:
             # Ensure video_id types are consistent for comparison
             current_df['video_id'] = current_df['video_id'].astype(str)
@@ -217,17 +351,36 @@ def _merge_video_dataframes(current_df, fetched_df):
 
             new_videos_df = fetched_df[
                 ~fetched_df['video_id'].isin(current_df['video_id'])
-            ].copy()
+            ]
+
+            _refresh_metadata_columns(current_df, fetched_df)
 
             if not new_videos_df.empty:
-                print(f"Info (Merge): Found {len(new_videos_df)} new videos to add.")
+                logger.info("Merge: Found %s new videos to add.", len(new_videos_df))
                 updated_df = pd.concat([current_df, new_videos_df], ignore_index=True)
             else:
-                print("Info (Merge): No new unique videos found.")
-                updated_df = current_df.copy()
+                logger.info("Merge: No new unique videos found.")
+                updated_df = current_df
                 
     return updated_df, new_videos_df
 
+def _refresh_metadata_columns(current_df, fetched_df):
+    """Updates enrichment columns (e.g. 'view_count') of videos already in the sheet with freshly fetched values."""
+    refreshed_columns = [column for column in METADATA_COLUMNS if column in fetched_df.columns]
+    if not refreshed_columns:
+        return
+
+    fresh_metadata = fetched_df.drop_duplicates('video_id').set_index('video_id')[refreshed_columns]
+    for column in refreshed_columns:
+        refreshed = current_df['video_id'].map(fresh_metadata[column].dropna())
+        if column in current_df.columns:
+            refreshed = refreshed.fillna(current_df[column])
+        current_df[column] = refreshed
+
+    refreshed_count = current_df['video_id'].isin(fresh_metadata.index).sum()
+    if refreshed_count:
+        logger.info("Merge: Refreshed %s for %s existing videos.", ', '.join(refreshed_columns), refreshed_count)
+
 def _finalize_updated_dataframe(updated_df):
     """Finalizes the updated DataFrame (sorting, 'added_to_db' string conversion)."""
     if updated_df.empty:
@@ -249,22 +402,35 @@ def _finalize_updated_dataframe(updated_df):
         # Optional: Convert date to string for sheet appearance
         # updated_df['date'] = updated_df['date'].dt.strftime('%Y-%m-%d %H:%M:%S').fillna('N/A')
     else:
-        print("Warning (Finalize): 'date' column not found for sorting.")
+        logger.warning("Finalize: 'date' column not found for sorting.")
         
     return updated_df
 
+def merge_fetched_videos(current_df, fetched_video_frame):
+    """
+    Merges fetched videos into the current sheet data and prepares the result for writing.
+
+    Returns:
+        tuple: (pd.DataFrame to write to the main sheet, number of new videos)
+    """
+    fetched_df = _prepare_fetched_data(fetched_video_frame)
+    updated_df, new_videos_df = _merge_video_dataframes(current_df, fetched_df)
+    return _finalize_updated_dataframe(updated_df), len(new_videos_df)
+
 def _write_df_to_sheet_and_update_dashboard(current_sheet, updated_df, new_videos_count, gc_client):
     """Writes the DataFrame to the sheet and updates the dashboard."""
     if updated_df.empty and new_videos_count == 0: # Check new_videos_count as well
-        print("Info (Write): Updated DataFrame is empty and no new videos. Sheet will not be cleared or updated.")
+        logger.info("Write: Updated DataFrame is empty and no new videos. Sheet will not be cleared or updated.")
     else:
-        print(f"Updating sheet with {len(updated_df)} total videos ({new_videos_count} new).")
-        current_sheet.clear()
-        set_with_dataframe(current_sheet, updated_df, include_index=False, resize=True)
-        print("Main sheet updated successf ully.")
+        logger.info("Updating sheet with %s total videos (%s new).", len(updated_df), new_videos_count)
+        _write_df_in_chunks(current_sheet, updated_df)
+        logger.info("Main sheet updated successf ully.")
+
+    # The sheet now matches updated_df, so keep a local copy for the stats display
+    save_video_snapshot(updated_df)
 
-    print("Attempting to update dashboard sheet...")
-    update_dashboard_sheet(gc_client, updated_df.copy()) # Pass a copy
+    logger.info("Attempting to update dashboard sheet...")
+    update_dashboard_sheet(gc_client, updated_df)
 
 def _offer_dataframe_info(df, df_name="Updated Sheet Data"):
     """Optionally prints detailed DataFrame information based on user input."""
@@ -272,71 +438,62 @@ def _offer_dataframe_info(df, df_name="Updated Sheet Data"):
     if user_input.lower() == 'y':
         print_dataframe_info(df, df_name)
 
-def _handle_update_video_sheet_errors(e):
-    """Handles errors for the update_video_sheet function."""
+def _handle_update_video_sheet_errors(e, operation="update_video_sheet"):
+    """Logs an error from a main sheet operation (update_video_sheet by default)."""
     if isinstance(e, gspread.exceptions.SpreadsheetNotFound):
-        print(f"Error: Spreadsheet '{SPREADSHEET_NAME}' not found. Please check the name and permissions.")
+        logger.error("Spreadsheet '%s' not found. Please check the name and permissions.", SPREADSHEET_NAME)
     elif isinstance(e, gspread.exceptions.APIError):
-        print(f"Google Sheets API Error: {str(e)}")
+        logger.error("Google Sheets API Error: %s", e)
         if hasattr(e, 'response') and e.response is not None and hasattr(e.response, 'status_code') and e.response.status_code == 429:
-            print("This might be due to Google Sheets API rate limits. Consider adding delays or batching updates if frequent.")
+            logger.warning("This might be due to Google Sheets API rate limits. Consider adding delays or batching updates if frequent.")
     else:
-        print(f"An unexpected error occurred in update_video_sheet: {str(e)}")
-        print(traceback.format_exc())
+        logger.exception("An unexpected error occurred in %s: %s", operation, e)
 
-def fetch_dashboard_stats():
+def save_video_snapshot(videos_df, path=VIDEO_SNAPSHOT_PATH):
+    """Persists a local copy of the main sheet's video data (failures are logged, not raised)."""
+    try:
+        snapshot_dir = os.path.dirname(path)
+        if snapshot_dir and not os.path.exists(snapshot_dir):
+            os.makedirs(snapshot_dir)
+        tmp_path = f"{path}.tmp"
+        videos_df.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning("Could not save local video snapshot '%s': %s", path, e)
+
+def load_video_snapshot(path=VIDEO_SNAPSHOT_PATH):
     """
-    Fetches the dashboard sheet data and returns it as a formatted DataFrame.
-    
+    Loads the local copy of the main sheet's video data.
+
     Returns:
-        pd.DataFrame: A DataFrame containing the dashboard statistics.
-        None: If an error occurs or the dashboard sheet does not exist.
+        tuple: (pd.DataFrame, datetime the snapshot was saved), or (None, None) if there is no usable snapshot.
     """
-    import gspread
-    import pandas as pd
-    import traceback
-    
     try:
-        print("Fetching dashboard statistics...")
-        gc = gspread.service_account()
-        sh = gc.open(SPREADSHEET_NAME)
-        
-        try:
-            dashboard_sheet = sh.worksheet("Dashboard")
-        except gspread.exceptions.WorksheetNotFound:
-            print("Dashboard sheet not found. Please run option 1 first to create and populate the dashboard.")
-            return None
-            
-        # Get data from dashboard sheet
-        dashboard_data = get_as_dataframe(dashboard_sheet)
-        
-        # Clean the DataFrame
-        if dashboard_data is not None and not dashboard_data.empty:
-            # Remove completely empty rows and columns
-            dashboard_data = dashboard_data.dropna(how='all').dropna(axis=1, how='all')
-            
-            # Reset the index for better display
-            dashboard_data = dashboard_data.reset_index(drop=True)
-            
-            print("Dashboard statistics fetched successfully.")
-            return dashboard_data
-        else:
-            print("Dashboard sheet exists but contains no data.")
-            return None
-            
-    except gspread.exceptions.SpreadsheetNotFound:
-        print(f"Error: Spreadsheet '{SPREADSHEET_NAME}' not found. Please check the name and permissions.")
-        return None
-    except gspread.exceptions.APIError as e:
-        print(f"Google Sheets API Error: {str(e)}")
-        if hasattr(e, 'response') and e.response.status_code == 429:
-            print("This might be due to Google Sheets API rate limits. Consider adding delays between requests.")
-        return None
+        saved_at = datetime.fromtimestamp(os.path.getmtime(path))
+        return pd.read_pickle(path), saved_at
+    except FileNotFoundError:
+        return None, None
     except Exception as e:
-        print(f"An unexpected error occurred while fetching dashboard stats: {str(e)}")
-        print(traceback.format_exc())
+        logger.warning("Could not read local video snapshot '%s': %s", path, e)
+        return None, None
+
+def fetch_video_sheet_data():
+    """
+    Reads the main video sheet and refreshes the local snapshot.
+
+    Returns:
+        pd.DataFrame: The main sheet's video data, or None if it could not be read.
+    """
+    try:
+        _, current_sheet = _setup_google_sheets_connection()
+        current_df = _get_current_sheet_data(current_sheet)
+    except Exception as e:
+        _handle_update_video_sheet_errors(e, operation="fetch_video_sheet_data")
         return None
 
+    save_video_snapshot(current_df)
+    return current_df
+
 def update_video_sheet(fetched_video_frame, show_detailed_info=False):
     """
     Updates the main video sheet with new videos from fetched_video_frame.
@@ -347,24 +504,25 @@ def update_video_sheet(fetched_video_frame, show_detailed_info=False):
         fetched_video_frame (pd.DataFrame): DataFrame containing newly fetched videos.
                                             Expected to have 'video_id' and other relevant columns.
         show_detailed_info (bool): If True, prompts to display detailed DataFrame info.
+
+    Returns:
+        bool: True if the main sheet was read and written, False if an error occurred (it is logged).
     """
     try:
         gc, current_sheet = _setup_google_sheets_connection()
 
         current_df = _get_current_sheet_data(current_sheet)
-        fetched_df = _prepare_fetched_data(fetched_video_frame)
-        
-        updated_df, new_videos_df = _merge_video_dataframes(current_df, fetched_df)
-        
-        final_updated_df = _finalize_updated_dataframe(updated_df)
-        
-        _write_df_to_sheet_and_update_dashboard(current_sheet, final_updated_df, len(new_videos_df), gc)
+        final_updated_df, new_videos_count = merge_fetched_videos(current_df, fetched_video_frame)
+
+        _write_df_to_sheet_and_update_dashboard(current_sheet, final_updated_df, new_videos_count, gc)
 
         if show_detailed_info:
             _offer_dataframe_info(final_updated_df)
 
     except Exception as e:
         _handle_update_video_sheet_errors(e)
+        return False
+    return True
     
         
 """Prints detailed information about a DataFrame including shape, columns, data types, first few rows, missing values, unique values per column, and basic statistics."""
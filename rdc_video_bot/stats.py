@@ -0,0 +1,147 @@
+"""
+Dashboard statistics computed locally from a cached snapshot of the main sheet.
+
+Every sync saves the rows it wrote to VIDEO_SNAPSHOT_PATH, so showing stats usually needs no
+Google Sheets request at all. The sheet is only read again when the snapshot is older than
+STATS_CACHE_TTL_MINUTES (or missing), or when the caller asks for a refresh; if that read
+fails, a stale snapshot is used rather than showing nothing.
+"""
+import logging
+from datetime import datetime, timedelta
+import pandas as pd
+from config import STATS_CACHE_TTL_MINUTES, STATS_WEEKS_TO_SHOW
+from sheet import build_dashboard_dataframe, fetch_video_sheet_data, load_video_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Age buckets (in days, inclusive upper bounds) for videos not yet marked 'added_to_db'
+BACKLOG_AGE_BUCKETS = [
+    ("0-7 days", 7),
+    ("8-30 days", 30),
+    ("31-90 days", 90),
+    ("91-365 days", 365),
+    ("Over a year", None),
+]
+UNKNOWN_AGE_BUCKET = "Unknown date"
+
+# Data sources reported by get_video_data
+SOURCE_CACHE = "cache"
+SOURCE_SHEET = "sheet"
+SOURCE_STALE_CACHE = "stale cache"
+
+
+def get_video_data(refresh=False, ttl_minutes=STATS_CACHE_TTL_MINUTES):
+    """
+    Returns the main sheet's video data, from the local snapshot while it is fresh.
+
+    Args:
+        refresh (bool): Read the sheet even if the snapshot is still fresh.
+        ttl_minutes (float): Maximum snapshot age before the sheet is read again.
+
+    Returns:
+        tuple: (pd.DataFrame or None, datetime the data was read, one of the SOURCE_* constants or None)
+    """
+    snapshot_df, saved_at = load_video_snapshot()
+    if snapshot_df is not None and not refresh and datetime.now() - saved_at <= timedelta(minutes=ttl_minutes):
+        logger.info("Stats: using local snapshot from %s.", saved_at.strftime("%Y-%m-%d %H:%M:%S"))
+        return snapshot_df, saved_at, SOURCE_CACHE
+
+    logger.info("Stats: reading the main sheet (%s).", "refresh requested" if refresh else "snapshot missing or stale")
+    sheet_df = fetch_video_sheet_data()
+    if sheet_df is not None:
+        return sheet_df, datetime.now(), SOURCE_SHEET
+
+    if snapshot_df is not None:
+        logger.warning("Stats: could not read the sheet; falling back to the snapshot from %s.",
+                       saved_at.strftime("%Y-%m-%d %H:%M:%S"))
+        return snapshot_df, saved_at, SOURCE_STALE_CACHE
+    return None, None, None
+
+
+def _added_to_db_mask(videos_df):
+    """Boolean mask of rows marked 'added_to_db' (the column holds bools, or 'TRUE'/'FALSE' text from the sheet)."""
+    if 'added_to_db' not in videos_df.columns:
+        return pd.Series(False, index=videos_df.index)
+    return videos_df['added_to_db'].astype(str).str.upper() == 'TRUE'
+
+
+def weekly_game_counts(videos_df, weeks=STATS_WEEKS_TO_SHOW, now=None):
+    """
+    Counts videos per game for each of the last `weeks` weeks (by publication date).
+
+    Returns:
+        pd.DataFrame: One row per week (labelled by its Monday, newest first), one column per game.
+    """
+    if videos_df.empty or 'date' not in videos_df.columns or 'games' not in videos_df.columns:
+        return pd.DataFrame()
+
+    dates = pd.to_datetime(videos_df['date'], errors='coerce')
+    week_starts = dates.dt.to_period('W-SUN').dt.start_time
+    current_week = pd.Timestamp(now or datetime.now()).to_period('W-SUN').start_time
+    first_week = current_week - pd.Timedelta(weeks=weeks - 1)
+
+    in_range = week_starts.between(first_week, current_week) & videos_df['games'].notna()
+    games = videos_df.loc[in_range, 'games'].astype(str).str.split(',').explode().str.strip()
+    if games.empty:
+        return pd.DataFrame()
+
+    # explode repeats each row's index once per game, so look the weeks up by label
+    counts = pd.crosstab(week_starts.loc[games.index].to_numpy(), games.to_numpy())
+    all_weeks = pd.date_range(first_week, current_week, freq='7D')
+    counts = counts.reindex(all_weeks, fill_value=0).sort_index(ascending=False)
+    counts.index = counts.index.strftime("%Y-%m-%d")
+    counts.index.name = "Week of"
+    counts.columns.name = None
+    return counts
+
+
+def backlog_by_age(videos_df, now=None):
+    """
+    Buckets videos not yet marked 'added_to_db' by how long ago they were published.
+
+    Returns:
+        pd.DataFrame: Columns 'Age' and 'Videos', one row per BACKLOG_AGE_BUCKETS entry (plus unknown dates, if any).
+    """
+    backlog = videos_df[~_added_to_db_mask(videos_df)] if not videos_df.empty else videos_df
+    if 'date' in backlog.columns:
+        dates = pd.to_datetime(backlog['date'], errors='coerce')
+    else:
+        dates = pd.Series(pd.NaT, index=backlog.index)
+    age_days = (pd.Timestamp(now or datetime.now()) - dates).dt.days
+
+    rows = []
+    lower = None
+    for label, upper in BACKLOG_AGE_BUCKETS:
+        in_bucket = age_days.notna()
+        if lower is not None:
+            in_bucket &= age_days > lower
+        if upper is not None:
+            in_bucket &= age_days <= upper
+        rows.append((label, int(in_bucket.sum())))
+        lower = upper
+
+    unknown_count = int(age_days.isna().sum())
+    if unknown_count:
+        rows.append((UNKNOWN_AGE_BUCKET, unknown_count))
+    return pd.DataFrame(rows, columns=["Age", "Videos"])
+
+
+def compute_dashboard_stats(videos_df, now=None, updated_at=None):
+    """
+    Computes the dashboard summary plus the weekly and backlog breakdowns.
+
+    Args:
+        videos_df (pd.DataFrame): Main sheet video data. Not modified.
+        now (datetime): Reference time for the breakdowns; defaults to now.
+        updated_at (datetime): When videos_df was read or saved, shown as the summary's
+                               'Last Dashboard Update'; defaults to now.
+
+    Returns:
+        dict: 'summary' (Statistic/Value DataFrame, as on the Dashboard sheet),
+              'weekly_game_counts' and 'backlog_by_age' DataFrames.
+    """
+    return {
+        "summary": build_dashboard_dataframe(videos_df, updated_at=updated_at or now),
+        "weekly_game_counts": weekly_game_counts(videos_df, now=now),
+        "backlog_by_age": backlog_by_age(videos_df, now=now),
+    }
@@ -0,0 +1,94 @@
+import random
+import unittest
+from unittest import mock
+
+import numpy as np
+from rapidfuzz import fuzz
+
+import classify
+from classify import classify_titles, classify_titles_sharded, compile_keywords, decode_game_masks
+from config import VIDEO_FILTER
+
+
+def _sample_titles(count=1500, seed=1234):
+    """Titles containing keywords verbatim, mutated, re-cased or not at all, plus short and empty ones."""
+    rng = random.Random(seed)
+    keywords = [keyword for game_keywords in VIDEO_FILTER.values() for keyword in game_keywords]
+    filler = ["full stream", "highlights", "we tried", "funniest moments", "part 2", "ft. friends", "!!", "vs", "rdc"]
+    alphabet = "abcdefghijklmnopqrstuvwxyz0123456789 "
+
+    def mutate(text):
+        chars = list(text)
+        for _ in range(rng.randint(1, 3)):
+            position = rng.randrange(len(chars) + 1)
+            operation = rng.choice(("insert", "delete", "replace"))
+            if operation == "insert" or not chars:
+                chars.insert(position, rng.choice(alphabet))
+            elif operation == "delete":
+                del chars[min(position, len(chars) - 1)]
+            else:
+                chars[min(position, len(chars) - 1)] = rng.choice(alphabet)
+        return "".join(chars)
+
+    titles = ["", "a", "MK", "mario", "'Twas a Mario Kart 8 night"]
+    while len(titles) < count:
+        words = rng.sample(filler, rng.randint(0, 3))
+        for _ in range(rng.randint(0, 2)):
+            keyword = rng.choice(keywords)
+            kind = rng.random()
+            if kind < 0.3:
+                keyword = mutate(keyword)
+            elif kind < 0.5:
+                keyword = keyword.upper() if rng.random() < 0.5 else keyword.swapcase()
+            elif kind < 0.6:
+                keyword = keyword[:max(1, len(keyword) // 2)]
+            words.insert(rng.randint(0, len(words)), keyword)
+        titles.append(" ".join(words))
+    return titles
+
+
+def _reference_masks(titles, threshold, scores):
+    """The original per-title, per-keyword partial_ratio loop, as a game bitmask per title."""
+    games = list(VIDEO_FILTER.keys())
+    masks = np.zeros(len(titles), dtype=np.uint32)
+    for title_index in range(len(titles)):
+        for game_index, game in enumerate(games):
+            if any(score > threshold for score in scores[title_index][game]):
+                masks[title_index] |= 1 << game_index
+    return masks
+
+
+class ClassifyTitlesTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.titles = _sample_titles()
+        cls.compiled = compile_keywords()
+        # Score every (title, keyword) pair once with the scorer the original loop used
+        cls.scores = [
+            {game: [fuzz.partial_ratio(keyword.lower(), title.lower()) for keyword in keywords]
+             for game, keywords in VIDEO_FILTER.items()}
+            for title in cls.titles
+        ]
+
+    def test_matches_per_keyword_partial_ratio_at_every_threshold(self):
+        for threshold in range(0, 102):
+            with self.subTest(threshold=threshold):
+                masks, path_counts = classify_titles(self.titles, self.compiled, threshold)
+                np.testing.assert_array_equal(masks, _reference_masks(self.titles, threshold, self.scores))
+                self.assertEqual(path_counts[classify.PATH_TOTAL], len(self.titles))
+
+    def test_sharded_classification_matches_in_process(self):
+        expected, _ = classify_titles(self.titles, self.compiled, 80)
+        with mock.patch.object(classify, "PARALLEL_CLASSIFY_MIN_TITLES", 0):
+            masks = classify_titles_sharded(self.titles, self.compiled, 80, workers=2, chunk_size=400)
+        np.testing.assert_array_equal(masks, expected)
+
+    def test_decode_game_masks_joins_sorted_game_names(self):
+        games = ("Zelda", "COD", "MK8")
+        self.assertEqual(decode_game_masks(np.array([0, 1, 6, 7], dtype=np.uint32), games),
+                         [None, "Zelda", "COD, MK8", "COD, MK8, Zelda"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+
+from config import VIEW_COUNT_TTL_HOURS
+from enrichment import apply_metadata_items, plan_metadata_lookups
+
+NOW = 1_700_000_000
+
+
+def _item(video_id, duration, live_details=None, view_count="10"):
+    item = {"id": video_id, "contentDetails": {"duration": duration}, "statistics": {"viewCount": view_count}}
+    if live_details is not None:
+        item["liveStreamingDetails"] = live_details
+    return item
+
+
+# videos.list items for each stage a video can be in, with the entry they should be cached as
+CASES = {
+    "upload": (_item("upload", "PT12M3S"),
+               {"duration": "0:12:03", "is_live_broadcast": False, "immutable_complete": True}),
+    "upcoming": (_item("upcoming", "P0D", {"scheduledStartTime": "2026-10-20T18:00:00Z"}),
+                 {"duration": "0:00:00", "is_live_broadcast": True, "immutable_complete": False}),
+    "live": (_item("live", "P0D", {"scheduledStartTime": "2026-10-19T18:00:00Z",
+                                   "actualStartTime": "2026-10-19T18:02:00Z"}),
+             {"duration": "0:00:00", "is_live_broadcast": True, "immutable_complete": False}),
+    "ended": (_item("ended", "PT2H5M", {"scheduledStartTime": "2026-10-18T18:00:00Z",
+                                        "actualStartTime": "2026-10-18T18:02:00Z",
+                                        "actualEndTime": "2026-10-18T20:07:00Z"}),
+              {"duration": "2:05:00", "is_live_broadcast": True, "immutable_complete": True}),
+}
+
+
+class ApplyMetadataItemsTest(unittest.TestCase):
+
+    def test_entries_by_stage(self):
+        for name, (item, expected) in CASES.items():
+            with self.subTest(name):
+                cache = {}
+                apply_metadata_items(cache, [item], now=NOW)
+                self.assertEqual(cache[name], dict(expected, view_count=10, view_count_fetched_at=NOW))
+
+    def test_view_count_refresh_keeps_immutable_fields(self):
+        cache = {}
+        apply_metadata_items(cache, [CASES["ended"][0]], now=NOW)
+        apply_metadata_items(cache, [{"id": "ended", "statistics": {"viewCount": "25"}}], now=NOW + 60)
+        self.assertEqual(cache["ended"], dict(CASES["ended"][1], view_count=25, view_count_fetched_at=NOW + 60))
+
+
+class PlanMetadataLookupsTest(unittest.TestCase):
+
+    def _cached(self):
+        cache = {}
+        apply_metadata_items(cache, [item for item, _ in CASES.values()], now=NOW)
+        return cache
+
+    def test_only_unfinished_broadcasts_and_unknown_videos_get_full_lookups(self):
+        full, refresh = plan_metadata_lookups(list(CASES) + ["unknown"], self._cached(), now=NOW + 60)
+        self.assertEqual(full, ["upcoming", "live", "unknown"])
+        self.assertEqual(refresh, [])
+
+    def test_finished_videos_get_view_count_refreshes_once_stale(self):
+        full, refresh = plan_metadata_lookups(list(CASES), self._cached(), now=NOW + VIEW_COUNT_TTL_HOURS * 3600)
+        self.assertEqual(full, ["upcoming", "live"])
+        self.assertEqual(refresh, ["upload", "ended"])
+
+    def test_entries_cached_before_the_live_broadcast_flag_get_full_lookups(self):
+        cache = {"old": {"duration": "0:12:03", "is_livestream": False, "immutable_complete": True,
+                         "view_count": 10, "view_count_fetched_at": NOW}}
+        self.assertEqual(plan_metadata_lookups(["old"], cache, now=NOW + 60), (["old"], []))
+
+    def test_zero_duration_entries_are_looked_up_again(self):
+        cache = {"stale": {"duration": "0:00:00", "is_live_broadcast": False, "immutable_complete": True,
+                           "view_count": 10, "view_count_fetched_at": NOW}}
+        self.assertEqual(plan_metadata_lookups(["stale"], cache, now=NOW + 60), (["stale"], []))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import asyncio
+import unittest
+from unittest import mock
+from urllib.parse import unquote
+
+import pandas as pd
+
+import ingest_async
+from config import MAX_CONCURRENT_API_REQUESTS
+
+
+class FakeSpreadsheet:
+    """Records the main sheet writes and how many block writes were in flight at once."""
+
+    def __init__(self, fail_ranges=()):
+        self.main_sheet = {"sheetId": 0, "title": "Sheet1", "gridProperties": {"rowCount": 1000, "columnCount": 26}}
+        self.fail_ranges = set(fail_ranges)
+        self.writes = []
+        self.sizes = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def update_values(self, sheet, range_name, values):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.001)
+            if range_name in self.fail_ranges:
+                raise RuntimeError(f"write to {range_name} failed")
+            self.writes.append((range_name, values))
+        finally:
+            self.in_flight -= 1
+
+    async def resize(self, sheet, rows, cols):
+        self.sizes.append((rows, cols))
+        sheet["gridProperties"] = {"rowCount": rows, "columnCount": cols}
+
+
+class WriteVideoSheetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({"title": [f"video {i}" for i in range(50)], "view_count": range(50)})
+
+    def test_blocks_are_built_only_as_writers_free_up(self):
+        built = []
+        real_write_blocks = ingest_async.write_blocks
+
+        def tracking_write_blocks(df, chunk_rows):
+            for block in real_write_blocks(df, chunk_rows):
+                built.append(block[0])
+                # Blocks built so far minus blocks written is what is held in memory
+                self.assertLessEqual(len(built) - len(spreadsheet.writes), MAX_CONCURRENT_API_REQUESTS + 1)
+                yield block
+
+        spreadsheet = FakeSpreadsheet()
+        with mock.patch.object(ingest_async, "write_blocks", tracking_write_blocks):
+            asyncio.run(ingest_async.write_video_sheet(spreadsheet, self.df, chunk_rows=2))
+
+        self.assertEqual(len(spreadsheet.writes), 26)
+        self.assertLessEqual(spreadsheet.max_in_flight, MAX_CONCURRENT_API_REQUESTS)
+        self.assertEqual(spreadsheet.sizes[-1], (51, 2))
+
+    def test_failed_block_is_raised_after_the_others_are_written(self):
+        spreadsheet = FakeSpreadsheet(fail_ranges={"A2:B3"})
+        with self.assertRaises(RuntimeError), self.assertLogs(ingest_async.logger, "ERROR"):
+            asyncio.run(ingest_async.write_video_sheet(spreadsheet, self.df, chunk_rows=2))
+
+        self.assertEqual(len(spreadsheet.writes), 25)
+        self.assertEqual(spreadsheet.sizes, [])
+
+
+class StaticCredentials:
+    valid = True
+    token = "token"
+
+
+@unittest.skipUnless(ingest_async.ASYNC_INGESTION_AVAILABLE, "needs the 'async' extra (httpx)")
+class SpreadsheetValuesUrlTest(unittest.TestCase):
+
+    def _send(self, call):
+        httpx = ingest_async.httpx
+        requests = []
+
+        def handler(request):
+            requests.append(request)
+            return httpx.Response(200, json={"values": [["a", "b"]]})
+
+        async def run():
+            client = ingest_async.AsyncGoogleClient("key", StaticCredentials())
+            await client._http.aclose()
+            client._http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            async with client:
+                sheet = {"sheetId": 7, "title": "Tab #1?x"}
+                return await call(ingest_async.AsyncSpreadsheet(client, "spreadsheet-id", [sheet]), sheet)
+
+        result = asyncio.run(run())
+        self.assertEqual(len(requests), 1)
+        return requests[0], result
+
+    def assert_range_in_path(self, request, range_name):
+        prefix = "/v4/spreadsheets/spreadsheet-id/values/"
+        raw_path = request.url.raw_path.decode().split("?")[0]
+        self.assertTrue(raw_path.startswith(prefix), raw_path)
+        self.assertEqual(unquote(raw_path[len(prefix):]), range_name)
+        self.assertEqual(request.url.fragment, "")
+
+    def test_get_values_encodes_the_sheet_title(self):
+        request, values = self._send(lambda spreadsheet, sheet: spreadsheet.get_values(sheet, "A1:B2"))
+        self.assert_range_in_path(request, "'Tab #1?x'!A1:B2")
+        self.assertEqual(request.url.query, b"")
+        self.assertEqual(values, [["a", "b"]])
+
+    def test_update_values_encodes_the_sheet_title(self):
+        request, _ = self._send(lambda spreadsheet, sheet: spreadsheet.update_values(sheet, "A1:B1", [["a", "b"]]))
+        self.assert_range_in_path(request, "'Tab #1?x'!A1:B1")
+        self.assertEqual(dict(request.url.params), {"valueInputOption": "USER_ENTERED"})
+
+
+if __name__ == "__main__":
+    unittest.main()
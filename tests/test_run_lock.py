@@ -0,0 +1,125 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import run_lock
+from run_lock import coordinated_run, ON_BUSY_SKIP, ON_BUSY_WAIT, STATUS_BUSY, STATUS_COMPLETED, STATUS_FAILED, STATUS_REUSED
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+class CoordinatedRunTest(unittest.TestCase):
+
+    def setUp(self):
+        state_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(state_dir.cleanup)
+        for name, value in {
+            "RUN_STATE_DIR": state_dir.name,
+            "LOCK_PATH": os.path.join(state_dir.name, "run.lock"),
+            "RESULT_PATH": os.path.join(state_dir.name, "last_run.json"),
+            "RUN_LOCK_POLL_SECONDS": 0.05,
+        }.items():
+            patcher = mock.patch.object(run_lock, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.calls = []
+
+    def _write_lock(self, pid, host=None, age_seconds=0):
+        with open(run_lock.LOCK_PATH, "w", encoding="utf-8") as lock_file:
+            json.dump({"run_id": "other", "run_name": "other run", "args": [], "pid": pid,
+                       "host": host or socket.gethostname(), "started_at": time.time() - age_seconds}, lock_file)
+        if age_seconds:
+            old = time.time() - age_seconds
+            os.utime(run_lock.LOCK_PATH, (old, old))
+
+    def _run(self, *args):
+        self.calls.append(args)
+        return True
+
+    def test_free_lock_runs_and_releases(self):
+        record = coordinated_run("sync", self._run, "2025-01-01")
+        self.assertEqual(record["status"], STATUS_COMPLETED)
+        self.assertEqual(self.calls, [("2025-01-01",)])
+        self.assertFalse(os.path.exists(run_lock.LOCK_PATH))
+
+    def test_busy_lock_skips_without_running(self):
+        self._write_lock(os.getpid())
+        record = coordinated_run("sync", self._run, "2025-01-01", on_busy=ON_BUSY_SKIP)
+        self.assertEqual(record["status"], STATUS_BUSY)
+        self.assertEqual(self.calls, [])
+        self.assertTrue(os.path.exists(run_lock.LOCK_PATH))
+
+    @unittest.skipUnless(os.name == "posix", "PID liveness is only checked on POSIX")
+    def test_lock_of_dead_pid_on_this_host_is_broken(self):
+        self._write_lock(_dead_pid())
+        record = coordinated_run("sync", self._run, "2025-01-01")
+        self.assertEqual(record["status"], STATUS_COMPLETED)
+        self.assertEqual(self.calls, [("2025-01-01",)])
+
+    @unittest.skipUnless(os.name == "posix", "PID liveness is only checked on POSIX")
+    def test_old_lock_of_live_pid_on_this_host_is_not_broken(self):
+        self._write_lock(os.getpid(), age_seconds=run_lock.RUN_LOCK_STALE_SECONDS + 3600)
+        record = coordinated_run("sync", self._run, "2025-01-01")
+        self.assertEqual(record["status"], STATUS_BUSY)
+        self.assertEqual(self.calls, [])
+
+    def test_lock_from_another_host_is_broken_only_once_its_heartbeat_is_old(self):
+        self._write_lock(12345, host="another-host")
+        self.assertEqual(coordinated_run("sync", self._run, "2025-01-01")["status"], STATUS_BUSY)
+
+        self._write_lock(12345, host="another-host", age_seconds=run_lock.RUN_LOCK_STALE_SECONDS + 60)
+        self.assertEqual(coordinated_run("sync", self._run, "2025-01-01")["status"], STATUS_COMPLETED)
+
+    def test_heartbeat_keeps_a_long_run_fresh(self):
+        def long_run():
+            old = time.time() - 3600
+            os.utime(run_lock.LOCK_PATH, (old, old))
+            time.sleep(0.3)
+            return time.time() - os.path.getmtime(run_lock.LOCK_PATH)
+
+        with mock.patch.object(run_lock, "RUN_LOCK_HEARTBEAT_SECONDS", 0.05):
+            record = coordinated_run("sync", long_run)
+        self.assertLess(record["result"], 60)
+
+    def _wait_for_concurrent_run(self, first_result):
+        first_started = threading.Event()
+
+        def first_run(*args):
+            first_started.set()
+            time.sleep(0.3)
+            return first_result
+
+        first = threading.Thread(target=coordinated_run, args=("sync", first_run, "2025-01-01"))
+        first.start()
+        self.assertTrue(first_started.wait(5))
+        record = coordinated_run("sync", self._run, "2025-01-01", on_busy=ON_BUSY_WAIT, wait_timeout=10)
+        first.join()
+        return record
+
+    def test_waiting_caller_reuses_a_successful_run(self):
+        record = self._wait_for_concurrent_run(first_result=True)
+        self.assertEqual(record["status"], STATUS_REUSED)
+        self.assertEqual(self.calls, [])
+
+    def test_waiting_caller_reruns_after_a_failed_run(self):
+        record = self._wait_for_concurrent_run(first_result=False)
+        self.assertEqual(record["status"], STATUS_COMPLETED)
+        self.assertEqual(self.calls, [("2025-01-01",)])
+
+    def test_falsy_result_is_recorded_as_failed(self):
+        self.assertEqual(coordinated_run("sync", lambda: False)["status"], STATUS_FAILED)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import types
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from sheet import SheetRowsBuffer, cell_value, dataframe_values, read_block_ranges, write_blocks, write_grid_size
+
+
+class CellValueTest(unittest.TestCase):
+
+    def test_values(self):
+        cases = [
+            ("plain", "plain"),
+            ("'Twas a run", "''Twas a run"),  # USER_ENTERED drops one leading apostrophe
+            ("it's", "it's"),
+            (np.int64(7), 7),
+            (np.float64(2.5), 2.5),
+            (True, True),
+            (np.nan, ""),
+            (None, ""),
+            (pd.NaT, ""),
+            (pd.Timestamp("2025-01-02 03:04:05"), "2025-01-02 03:04:05"),
+        ]
+        for value, expected in cases:
+            with self.subTest(value=value):
+                result = cell_value(value)
+                self.assertEqual(result, expected)
+                self.assertIs(type(result), type(expected))
+
+    def test_dataframe_values(self):
+        df = pd.DataFrame({"title": ["'quoted", None], "view_count": [3, 4]})
+        self.assertEqual(dataframe_values(df), [["''quoted", 3], ["", 4]])
+        self.assertEqual(dataframe_values(df, include_header=True), [["title", "view_count"], ["''quoted", 3], ["", 4]])
+
+
+class BlockRangesTest(unittest.TestCase):
+
+    def test_read_block_ranges(self):
+        self.assertEqual(read_block_ranges(3, 10, chunk_rows=4), [(2, "A2:C5"), (6, "A6:C9"), (10, "A10:C10")])
+        self.assertEqual(read_block_ranges(2, 5, chunk_rows=4), [(2, "A2:B5")])
+        self.assertEqual(read_block_ranges(2, 1, chunk_rows=4), [])
+
+    def test_write_blocks(self):
+        df = pd.DataFrame({"title": ["a", "b", "c", "d", "e"], "view_count": range(5)})
+        self.assertEqual(write_grid_size(df), (6, 2))
+        self.assertEqual(list(write_blocks(df, chunk_rows=2)), [
+            ("A1:B1", [["title", "view_count"]]),
+            ("A2:B3", [["a", 0], ["b", 1]]),
+            ("A4:B5", [["c", 2], ["d", 3]]),
+            ("A6:B6", [["e", 4]]),
+        ])
+
+    def test_write_blocks_of_an_empty_frame_write_only_the_header(self):
+        df = pd.DataFrame(columns=["title"])
+        self.assertEqual(write_grid_size(df), (1, 1))
+        self.assertEqual(list(write_blocks(df)), [("A1:A1", [["title"]])])
+
+    def test_write_blocks_builds_values_lazily(self):
+        blocks = write_blocks(pd.DataFrame({"title": ["a", "b"]}), chunk_rows=1)
+        self.assertIsInstance(blocks, types.GeneratorType)
+
+
+def _read_back(value):
+    """A USER_ENTERED cell value as the Sheets API returns it: text, with one leading apostrophe stripped."""
+    if isinstance(value, bool):
+        return str(value).upper()
+    value = str(value)
+    return value[1:] if value.startswith("'") else value
+
+
+class SheetRowsBufferTest(unittest.TestCase):
+
+    def test_blocks_in_any_order(self):
+        buffer = SheetRowsBuffer(["title", "view_count", "games"], row_count=8)
+        buffer.add_block(6, [["e", "5"], [], ["g", "", "COD"]])
+        buffer.add_block(2, [["a", "1", "MK8"], ["", "", ""], ["c"]])
+        df = buffer.to_dataframe()
+
+        self.assertEqual(df["title"].tolist(), ["a", "c", "e", "g"])
+        np.testing.assert_array_equal(df["view_count"].to_numpy(), [1.0, np.nan, 5.0, np.nan])
+        self.assertEqual(df["games"].isna().tolist(), [False, True, True, False])
+
+    def test_round_trip_through_write_blocks(self):
+        source = pd.DataFrame({
+            "title": ["'Twas a run", "MK8 race", "COD night"],
+            "date": pd.to_datetime(["2025-01-01 10:00:00", "2025-01-02 11:00:00", "2025-01-03 12:00:00"]),
+            "added_to_db": [True, False, False],
+            "view_count": [10, None, 30],
+        })
+        grid = {}
+        for block_range, values in write_blocks(source, chunk_rows=2):
+            first_row = int(block_range.split(":")[0][1:])
+            for offset, row in enumerate(values):
+                grid[first_row + offset] = [_read_back(value) for value in row]
+        header = grid.pop(1)
+
+        buffer = SheetRowsBuffer(header, row_count=10)
+        for first_row, _ in read_block_ranges(len(header), 10, chunk_rows=2):
+            buffer.add_block(first_row, [grid.get(row, []) for row in (first_row, first_row + 1)])
+        df = buffer.to_dataframe()
+
+        self.assertEqual(df["title"].tolist(), source["title"].tolist())
+        self.assertEqual(df["added_to_db"].tolist(), [True, False, False])
+        self.assertEqual(df["date"].tolist(), source["date"].tolist())
+        np.testing.assert_array_equal(df["view_count"].to_numpy(), [10.0, np.nan, 30.0])
+
+    def test_empty_sheet(self):
+        buffer = SheetRowsBuffer(["title", "date"], row_count=5)
+        buffer.add_block(2, [[], ["", ""]])
+        self.assertTrue(buffer.to_dataframe().empty)
+        self.assertTrue(SheetRowsBuffer([], row_count=1).to_dataframe().empty)
+
+
+if __name__ == "__main__":
+    unittest.main()